@@ -1,41 +1,170 @@
 # backend/app.py
 
-from flask import Flask, request, jsonify
+import json
+import queue
+import threading
+import time
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from utils.pdf_processor import extract_text_from_pdf
-from utils.ai_client import GeminiClient, translate_text, text_to_speech
+from utils.pdf_processor import EXTRACTION_MODES, MAX_UPLOAD_BYTES, PdfRejected, extraction_cache, spool_pdf
+from utils.model_registry import get_client
+from utils.ai_client import ANALYSIS_MODES, DEFAULT_ANALYSIS_MODE, fast_analysis_stream, translate_text, translate_batch, result_cache_stats
+from utils.document_store import DocumentNotStored, create_document_store
+from utils.clause_rules import fast_analysis
+from utils.retrieval import retrieve_passages
+from utils.tts import synthesize_stream
+from utils.jobs import JobQueue, QueueFull
+from utils.compare import diff_documents
+from utils.metrics import start_trace, current_trace_id, traced, observe, log_event, render_prometheus, prune_metrics_dir
+from utils.deadlines import start_deadline, DeadlineExceeded
 
 # Initialize Flask App and CORS
 app = Flask(__name__)
 # This is crucial to allow your React frontend to communicate with this backend
 CORS(app) 
+# Bodies over this are refused (413) before they are read; a compare request carries two PDFs.
+# Each PDF is checked against MAX_UPLOAD_MB and MAX_PDF_PAGES when it is extracted.
+app.config['MAX_CONTENT_LENGTH'] = 2 * MAX_UPLOAD_BYTES + 1024 * 1024
 
-# In-memory storage for the extracted text of the last uploaded document.
-# For a hackathon, this is sufficient. For production, you'd use a more robust cache like Redis.
-document_context_store = {
-    "text": None
-}
+# Extracted documents are kept under a document ID in a store shared by all
+# workers, so /ask, /translate and /compare never need to re-extract a PDF.
+document_store = create_document_store()
 
-# Initialize the AI client once
+# Long-running analyze/compare work can be submitted to the job queue instead
+job_queue = JobQueue()
+
+# /metrics sums the snapshots of all processes; gunicorn clears them before its
+# workers start, and any other way of running the app drops those of exited processes
+prune_metrics_dir()
+
+# The AI client is shared with the PDF processor and job handlers through the registry
 try:
-    ai_client = GeminiClient()
+    ai_client = get_client()
 except ValueError as e:
     print(f"Failed to initialize GeminiClient: {e}")
     ai_client = None
 
+def cache_bypassed() -> bool:
+    """
+    A single request can skip the result cache with a `Cache-Control: no-cache`
+    header or a `no_cache=true` query/form field.
+    """
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return True
+    return request.values.get('no_cache', '').lower() in ('1', 'true', 'yes')
+
+def requested_modes():
+    """
+    Reads the optional "extraction_mode" (overrides PDF_EXTRACTION_MODE: "auto",
+    "text-only" or "ocr-only") and "analysis_mode" (overrides ANALYSIS_MODE: "full"
+    for the model, "fast" for the local clause rules only) form fields.
+
+    Returns:
+        (extraction_mode, analysis_mode, error): a mode is None when not given;
+        error is a 400 response for an unknown mode, a 500 if the analysis needs
+        the model but the AI client is not initialized, otherwise None.
+    """
+    extraction_mode = request.form.get('extraction_mode') or None
+    if extraction_mode and extraction_mode not in EXTRACTION_MODES:
+        return None, None, (jsonify({"error": f"extraction_mode must be one of {', '.join(EXTRACTION_MODES)}"}), 400)
+    analysis_mode = request.form.get('analysis_mode') or None
+    if analysis_mode and analysis_mode not in ANALYSIS_MODES:
+        return None, None, (jsonify({"error": f"analysis_mode must be one of {', '.join(ANALYSIS_MODES)}"}), 400)
+    # "fast" analysis only runs the local clause rules
+    if not ai_client and (analysis_mode or DEFAULT_ANALYSIS_MODE) != "fast":
+        return None, None, (jsonify({"error": "AI client is not initialized. Check API key."}), 500)
+    return extraction_mode, analysis_mode, None
+
+def requested_question(data):
+    """
+    The "question" of an /ask JSON body, or None unless it is a non-empty string.
+    """
+    question = data.get('question') if isinstance(data, dict) else None
+    return question if isinstance(question, str) and question.strip() else None
+
+def sse_event(event: str, data) -> str:
+    """
+    Formats one server-sent event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Sent while waiting on slow work so proxies don't close an idle stream
+SSE_KEEPALIVE = ": keep-alive\n\n"
+SSE_KEEPALIVE_SECONDS = 15
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def section_to_text(section) -> str:
+    """
+    Flattens a stored analysis section (summary string or clause list) into translatable text.
+    """
+    if isinstance(section, list):
+        return "\n".join(f"{item.get('title', '')}: {item.get('detail', '')}" for item in section)
+    return section or ""
+
+# --- Tracing ---
+# Every request gets a trace ID (the caller's X-Request-ID if sent) that tags
+# its stage timings in the structured logs and is echoed as X-Trace-Id.
+
+@app.before_request
+def begin_request_trace():
+    g.request_started = time.perf_counter()
+    start_trace(request.headers.get('X-Request-ID'))
+    # Model calls and page OCR for this request stop at REQUEST_TIMEOUT_SECONDS
+    g.deadline = start_deadline()
+
+def deadline_error():
+    return jsonify({"error": "The request took too long and was stopped. Try again or submit it as a job."}), 504
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({"error": f"Uploads are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB per PDF."}), 413
+
+@app.after_request
+def end_request_trace(response):
+    # For streamed responses this is the time to the headers, not to the last event
+    seconds = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe('saralkanoon_http_request_seconds', seconds, method=request.method, endpoint=endpoint, status=response.status_code)
+    log_event('request', method=request.method, path=request.path, status=response.status_code, ms=round(seconds * 1000, 2))
+    response.headers['X-Trace-Id'] = current_trace_id()
+    return response
+
 # --- API Endpoints ---
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Stage timings, sizes, token counts and cache lookups of all workers, in Prometheus text format.
+    """
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit/miss counters of the result and extraction caches for this worker.
+    """
+    return jsonify({"results": result_cache_stats(), "extraction": extraction_cache.stats()})
+
 # Translation endpoint
 @app.route('/translate', methods=['POST'])
 def translate_section():
     """
     Endpoint to translate a section of the document to a target language.
     Expects JSON: { "section": "summary"|"keyClauses"|"redFlags", "text": "...", "target_lang": "hi"|"en"|... }
+    Instead of "text", a "document_id" from /analyze translates that section of the stored analysis.
     """
     data = request.get_json()
-    if not data or 'section' not in data or 'text' not in data or 'target_lang' not in data:
+    if not data or 'section' not in data or 'target_lang' not in data:
         return jsonify({"error": "Missing required fields."}), 400
 
+    if 'text' not in data:
+        document = document_store.get(data.get('document_id'))
+        if not document or not document.get('analysis'):
+            return jsonify({"error": "Missing required fields."}), 400
+        if not isinstance(data['section'], str) or data['section'] not in document['analysis']:
+            return jsonify({"error": f"Unknown section: {data['section']}"}), 400
+        data['text'] = section_to_text(document['analysis'].get(data['section']))
+
     # Only allow translation of keyClauses/redFlags if explicitly requested
     if data['section'] in ['keyClauses', 'redFlags'] and data.get('target_lang') == 'hi':
         # Only translate if user requested
@@ -48,21 +177,54 @@ def translate_section():
         print(f"Error in /translate: {e}")
         return jsonify({"error": "Translation failed."}), 500
 
+# Batch translation endpoint
+MAX_BATCH_SEGMENTS = 500
+
+@app.route('/translate/batch', methods=['POST'])
+def translate_segments():
+    """
+    Endpoint to translate many text segments into one or more languages in one request.
+    Expects JSON: { "segments": ["...", ...], "target_langs": ["hi", ...] } ("target_lang" also accepted)
+    Returns: { "translations": { "hi": ["...", ...] } } aligned with "segments".
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('segments'), list):
+        return jsonify({"error": "Missing required fields."}), 400
+
+    target_langs = data.get('target_langs') or ([data['target_lang']] if data.get('target_lang') else [])
+    if not target_langs or not all(isinstance(lang, str) for lang in target_langs):
+        return jsonify({"error": "Missing required fields."}), 400
+    if len(data['segments']) > MAX_BATCH_SEGMENTS or not all(isinstance(s, str) for s in data['segments']):
+        return jsonify({"error": f"segments must be a list of at most {MAX_BATCH_SEGMENTS} strings."}), 400
+
+    try:
+        return jsonify({"translations": translate_batch(data['segments'], target_langs)})
+    except Exception as e:
+        print(f"Error in /translate/batch: {e}")
+        return jsonify({"error": "Translation failed."}), 500
+
 # Audio endpoint
 @app.route('/audio', methods=['POST'])
 def audio_section():
     """
     Endpoint to convert a section of text to speech audio.
     Expects JSON: { "text": "...", "lang": "en"|"hi"|... }
-    Returns: audio file (mp3/wav)
+    Returns: audio file (mp3), streamed sentence by sentence as it is synthesized
     """
     data = request.get_json()
     if not data or 'text' not in data or 'lang' not in data:
         return jsonify({"error": "Missing required fields."}), 400
     try:
-        audio_bytes = text_to_speech(data['text'], data['lang'])
+        audio_chunks = synthesize_stream(data['text'], data['lang'])
+        # Wait for the first chunk so a failing synthesizer still gets a proper error response
+        first_chunk = next(audio_chunks, b'')
+
+        def generate():
+            yield first_chunk
+            yield from audio_chunks
+
         # Return as file download
-        return (audio_bytes, 200, {
+        return Response(stream_with_context(generate()), 200, {
             'Content-Type': 'audio/mpeg',
             'Content-Disposition': 'attachment; filename="output.mp3"'
         })
@@ -74,35 +236,57 @@ def audio_section():
 def analyze_pdf():
     """
     Endpoint to upload a PDF, extract text, and get the initial analysis.
-    The extracted text is stored in memory for follow-up questions.
+    The extracted text is stored under the returned "documentId" for follow-up requests.
+    "extraction" reports how each page was read: {page, method, reason, chars, cached}.
+    Sending a "document_id" form field instead of a file re-analyzes a stored document.
+    An "analysis_mode" of "fast" answers from the local clause rules alone, without the model.
     """
-    if not ai_client:
-        return jsonify({"error": "AI client is not initialized. Check API key."}), 500
+    document_id = request.form.get('document_id')
+    document = document_store.get(document_id) if document_id else None
+    if document_id and not document:
+        return jsonify({"error": "Unknown or expired document_id. Please upload the document again."}), 404
 
-    if 'document' not in request.files:
-        return jsonify({"error": "No document file provided"}), 400
-    
-    pdf_file = request.files['document']
-    
-    if pdf_file.filename == '' or not pdf_file.filename.endswith('.pdf'):
-        return jsonify({"error": "Please provide a valid PDF file"}), 400
+    if not document:
+        if 'document' not in request.files:
+            return jsonify({"error": "No document file provided"}), 400
+
+        pdf_file = request.files['document']
+
+        if pdf_file.filename == '' or not pdf_file.filename.endswith('.pdf'):
+            return jsonify({"error": "Please provide a valid PDF file"}), 400
+
+    extraction_mode, analysis_mode, error = requested_modes()
+    if error:
+        return error
 
     try:
-        extracted_text = extract_text_from_pdf(pdf_file.stream)
-        if not extracted_text.strip():
-            return jsonify({"error": "Could not extract text from PDF"}), 400
+        if document:
+            extracted_text, extraction = document["text"], document.get("extraction")
+        else:
+            document_id, extracted_text, extraction = document_store.ingest_pdf(pdf_file.stream, extraction_mode)
+            if not extracted_text:
+                return jsonify({"error": "Could not extract text from PDF", "extraction": extraction}), 400
 
-        # Store the text for the Q&A endpoint
-        document_context_store["text"] = extracted_text
-        
         # Get the analysis from the AI client
-        analysis_result = ai_client.analyze_document(extracted_text)
+        if ai_client:
+            analysis_result = ai_client.analyze_document(
+                extracted_text, use_cache=not cache_bypassed(), mode=analysis_mode
+            )
+        else:
+            analysis_result = fast_analysis(extracted_text)
         
         if "error" in analysis_result:
              return jsonify(analysis_result), 500
 
-        return jsonify(analysis_result)
+        document_store.update(document_id, analysis=analysis_result)
+        return jsonify({**analysis_result, "documentId": document_id, "extraction": extraction})
 
+    except PdfRejected as e:
+        return jsonify({"error": str(e)}), 413
+    except DocumentNotStored as e:
+        return jsonify({"error": str(e)}), 503
+    except DeadlineExceeded:
+        return deadline_error()
     except Exception as e:
         print(f"An error occurred in /analyze: {e}")
         return jsonify({"error": "An internal server error occurred"}), 500
@@ -110,68 +294,335 @@ def analyze_pdf():
 @app.route('/ask', methods=['POST'])
 def ask_question():
     """
-    Endpoint to ask a follow-up question about the most recently uploaded document.
+    Endpoint to ask a follow-up question about an analyzed document.
+    Expects JSON: { "question": "...", "document_id": "<documentId from /analyze>" }
     """
     if not ai_client:
         return jsonify({"error": "AI client is not initialized. Check API key."}), 500
 
     data = request.get_json()
-    if not data or 'question' not in data:
+    user_question = requested_question(data)
+    if not user_question:
         return jsonify({"error": "No question provided"}), 400
     
-    user_question = data['question']
-    
     # Retrieve the stored document text
-    document_text = document_context_store.get("text")
+    document = document_store.get(data.get('document_id'))
     
-    if not document_text:
+    if not document:
         return jsonify({"error": "No document has been analyzed yet. Please upload a document first."}), 400
 
+    document_text = document["text"]
+
     try:
-        answer = ai_client.answer_question(document_text, user_question)
+        # Long documents only send the passages relevant to the question
+        passages = retrieve_passages(data['document_id'], document_text, user_question)
+        answer = ai_client.answer_question(document_text, user_question, passages)
         return jsonify({"answer": answer})
 
+    except DeadlineExceeded:
+        return deadline_error()
     except Exception as e:
         print(f"An error occurred in /ask: {e}")
         return jsonify({"error": "An internal server error occurred"}), 500
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_pdf_stream():
+    """
+    Streaming version of /analyze using server-sent events. Emits:
+      "page"      per-page extraction progress {page, totalPages, method, reason, chars, cached}
+      "document"  {documentId} once extraction is done
+      "prescreen" {keyClauses, redFlags} from the local clause rules, before the model's
+                  analysis (not sent for cached results or analysis_mode "fast")
+      "summary", "keyClauses", "redFlags"  each analysis section as soon as it is ready
+      "done"      the full analysis with documentId and extraction (as in /analyze), or "error" {error}
+    """
+    if 'document' not in request.files:
+        return jsonify({"error": "No document file provided"}), 400
+
+    pdf_file = request.files['document']
+
+    if pdf_file.filename == '' or not pdf_file.filename.endswith('.pdf'):
+        return jsonify({"error": "Please provide a valid PDF file"}), 400
+
+    extraction_mode, analysis_mode, error = requested_modes()
+    if error:
+        return error
+
+    use_cache = not cache_bypassed()
+    try:
+        # On disk before the stream starts: the upload is closed once this view returns
+        pdf_upload = spool_pdf(pdf_file.stream)
+    except PdfRejected as e:
+        return jsonify({"error": str(e)}), 413
+    events = queue.Queue()
+
+    def on_page(entry, total_pages):
+        events.put(("page", {
+            "page": entry["page"],
+            "totalPages": total_pages,
+            "method": entry["method"],
+            "reason": entry["reason"],
+            "chars": entry["chars"],
+            "cached": entry.get("cached", False),
+        }))
+
+    def run():
+        # Extraction and analysis run off the response thread so progress can be flushed as it happens
+        try:
+            document_id, extracted_text, extraction = document_store.ingest_pdf(pdf_upload, extraction_mode, on_page)
+            if not extracted_text:
+                events.put(("error", {"error": "Could not extract text from PDF"}))
+                return
+            events.put(("document", {"documentId": document_id}))
+
+            if ai_client:
+                analysis = ai_client.analyze_document_stream(extracted_text, use_cache, analysis_mode)
+            else:
+                analysis = fast_analysis_stream(extracted_text)
+            for section, value in analysis:
+                if section == "error":
+                    events.put(("error", {"error": value}))
+                    return
+                if section == "result":
+                    document_store.update(document_id, analysis=value)
+                    events.put(("done", {**value, "documentId": document_id, "extraction": extraction}))
+                    return
+                events.put((section, value))
+        except (PdfRejected, DocumentNotStored) as e:
+            events.put(("error", {"error": str(e)}))
+        except DeadlineExceeded as e:
+            print(f"/analyze/stream stopped: {e}")
+            events.put(("error", {"error": "The request took too long and was stopped."}))
+        except Exception as e:
+            print(f"An error occurred in /analyze/stream: {e}")
+            events.put(("error", {"error": "An internal server error occurred"}))
+        finally:
+            pdf_upload.close()
+            events.put(None)
+
+    threading.Thread(target=traced(run), daemon=True).start()
+    deadline = g.deadline
+
+    def generate():
+        try:
+            yield sse_event("start", {"filename": pdf_file.filename})
+            while True:
+                try:
+                    item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield SSE_KEEPALIVE
+                    continue
+                if item is None:
+                    return
+                yield sse_event(*item)
+        finally:
+            # Client gone (or stream over): stop rendering pages and drop queued OCR calls
+            deadline.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """
+    Streaming version of /ask using server-sent events: "token" events carry
+    answer text as it is generated, followed by "done" {answer}.
+    Expects JSON: { "question": "...", "document_id": "<documentId from /analyze>" }
+    """
+    if not ai_client:
+        return jsonify({"error": "AI client is not initialized. Check API key."}), 500
+
+    data = request.get_json()
+    user_question = requested_question(data)
+    if not user_question:
+        return jsonify({"error": "No question provided"}), 400
+
+    document = document_store.get(data.get('document_id'))
+    if not document:
+        return jsonify({"error": "No document has been analyzed yet. Please upload a document first."}), 400
+
+    def generate():
+        answer = []
+        try:
+            passages = retrieve_passages(data['document_id'], document["text"], user_question)
+            for text in ai_client.answer_question_stream(document["text"], user_question, passages):
+                answer.append(text)
+                yield sse_event("token", {"text": text})
+            yield sse_event("done", {"answer": "".join(answer).strip()})
+        except DeadlineExceeded as e:
+            print(f"/ask/stream stopped: {e}")
+            yield sse_event("error", {"error": "The request took too long and was stopped."})
+        except Exception as e:
+            print(f"An error occurred in /ask/stream: {e}")
+            yield sse_event("error", {"error": "An internal server error occurred"})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
     
 @app.route('/compare', methods=['POST'])
 def compare_pdfs():
     """
     Endpoint to upload two PDFs, compare them, and return the differences.
+    Either document can be given as an upload ('old_document' / 'new_document')
+    or as a stored ID from /analyze ('old_document_id' / 'new_document_id').
     """
     if not ai_client:
         return jsonify({"error": "AI client is not initialized"}), 500
 
-    if 'old_document' not in request.files or 'new_document' not in request.files:
-        return jsonify({"error": "Both 'old_document' and 'new_document' files are required"}), 400
-
-    old_pdf = request.files['old_document']
-    new_pdf = request.files['new_document']
-
-    if old_pdf.filename == '' or new_pdf.filename == '':
-        return jsonify({"error": "Please provide both documents"}), 400
+    error = compare_inputs_error()
+    if error:
+        return error
 
     try:
-        # Extract text from both documents
-        old_text = extract_text_from_pdf(old_pdf.stream)
-        new_text = extract_text_from_pdf(new_pdf.stream)
+        old_id, old_text, new_id, new_text = load_compare_texts()
 
-        if not old_text.strip() or not new_text.strip():
+        if not old_text or not new_text:
             return jsonify({"error": "Could not extract text from one or both PDFs."}), 400
 
         # Call the new comparison method in the AI client
-        comparison_result = ai_client.compare_documents(old_text, new_text)
+        comparison_result = ai_client.compare_documents(old_text, new_text, use_cache=not cache_bypassed())
 
         if "error" in comparison_result:
             return jsonify(comparison_result), 500
 
-        return jsonify(comparison_result)
+        return jsonify({**comparison_result, "oldDocumentId": old_id, "newDocumentId": new_id})
 
+    except PdfRejected as e:
+        return jsonify({"error": str(e)}), 413
+    except DocumentNotStored as e:
+        return jsonify({"error": str(e)}), 503
+    except DeadlineExceeded:
+        return deadline_error()
     except Exception as e:
         print(f"An error occurred in /compare: {e}")
         return jsonify({"error": "An internal server error occurred"}), 500
 
+@app.route('/compare/diff', methods=['POST'])
+def diff_pdfs():
+    """
+    Fast local comparison without the model: each clause is reported as
+    unchanged, added, removed or modified. Takes the same inputs as /compare.
+    """
+    error = compare_inputs_error()
+    if error:
+        return error
+
+    try:
+        old_id, old_text, new_id, new_text = load_compare_texts()
+
+        if not old_text or not new_text:
+            return jsonify({"error": "Could not extract text from one or both PDFs."}), 400
+
+        return jsonify({**diff_documents(old_text, new_text), "oldDocumentId": old_id, "newDocumentId": new_id})
+
+    except PdfRejected as e:
+        return jsonify({"error": str(e)}), 413
+    except DocumentNotStored as e:
+        return jsonify({"error": str(e)}), 503
+    except DeadlineExceeded:
+        return deadline_error()
+    except Exception as e:
+        print(f"An error occurred in /compare/diff: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+def compare_inputs_error():
+    """
+    Checks that both compare inputs are given as an upload or a stored document ID.
+    """
+    for field in ('old_document', 'new_document'):
+        document_id = request.form.get(f'{field}_id')
+        if document_id:
+            if not document_store.get(document_id):
+                return jsonify({"error": f"Unknown or expired {field}_id. Please upload the document again."}), 404
+        elif field not in request.files:
+            return jsonify({"error": "Both 'old_document' and 'new_document' files are required"}), 400
+        elif request.files[field].filename == '':
+            return jsonify({"error": "Please provide both documents"}), 400
+    return None
+
+def load_compare_texts():
+    """
+    Returns (old_id, old_text, new_id, new_text), extracting any document
+    that was uploaded rather than referenced by ID.
+    """
+    texts = []
+    for field in ('old_document', 'new_document'):
+        document_id = request.form.get(f'{field}_id')
+        document = document_store.get(document_id) if document_id else None
+        if document:
+            texts.extend([document_id, document["text"]])
+        else:
+            document_id, text, _ = document_store.ingest_pdf(request.files[field].stream)
+            texts.extend([document_id, text])
+    return tuple(texts)
+
+# --- Job Endpoints ---
+
+@app.route('/jobs/analyze', methods=['POST'])
+def submit_analyze_job():
+    """
+    Queues an /analyze run and returns its job ID right away (202).
+    Takes the same form fields as /analyze. Poll GET /jobs/<job_id> for progress and the result.
+    """
+    if 'document' not in request.files:
+        return jsonify({"error": "No document file provided"}), 400
+
+    pdf_file = request.files['document']
+
+    if pdf_file.filename == '' or not pdf_file.filename.endswith('.pdf'):
+        return jsonify({"error": "Please provide a valid PDF file"}), 400
+
+    extraction_mode, analysis_mode, error = requested_modes()
+    if error:
+        return error
+
+    params = {"extraction_mode": extraction_mode, "analysis_mode": analysis_mode, "use_cache": not cache_bypassed()}
+    return submit_job("analyze", params, {"document": pdf_file.stream})
+
+@app.route('/jobs/compare', methods=['POST'])
+def submit_compare_job():
+    """
+    Queues a /compare run and returns its job ID right away (202).
+    Takes the same uploads / document IDs as /compare.
+    """
+    params = {"use_cache": not cache_bypassed()}
+    files = {}
+    for field in ('old_document', 'new_document'):
+        if request.form.get(f'{field}_id'):
+            params[f'{field}_id'] = request.form[f'{field}_id']
+        elif field not in request.files:
+            return jsonify({"error": "Both 'old_document' and 'new_document' files are required"}), 400
+        elif request.files[field].filename == '':
+            return jsonify({"error": "Please provide both documents"}), 400
+        else:
+            files[field] = request.files[field].stream
+    return submit_job("compare", params, files)
+
+def submit_job(kind, params, files):
+    try:
+        job_id = job_queue.submit(kind, params, files)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '30'}
+    return jsonify({"jobId": job_id, "status": "queued"}), 202, {'Location': f'/jobs/{job_id}'}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Returns {jobId, kind, status, progress, message} plus "result" once done or "error" if it failed.
+    status is one of queued, running, done, failed, cancelled.
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancels a queued job, or stops a running one at its next page.
+    """
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 404
+    return jsonify(job_queue.get(job_id))
+
 # --- Main entry point ---
 if __name__ == '__main__':
     # Runs the server on http://127.0.0.1:5000
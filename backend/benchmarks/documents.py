@@ -0,0 +1,65 @@
+# backend/benchmarks/documents.py
+#
+# Synthetic multi-page PDFs built from the sample rental agreement.
+
+import os
+import fitz  # PyMuPDF
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rental_agreement.pdf")
+
+# Edits applied to the "new" version of a document for comparison runs
+AMENDMENTS = {
+    "11 months": "24 months",
+    "₹15,000": "₹18,500",
+    "one month": "three months",
+}
+
+def build_digital_pdf(page_count: int, amended: bool = False) -> bytes:
+    """
+    Makes a PDF with a real text layer by re-typesetting the sample agreement's pages.
+
+    Args:
+        page_count: Number of pages; the sample's pages are repeated as needed.
+        amended: Apply AMENDMENTS, giving a second version to compare against.
+    """
+    source = fitz.open(SAMPLE_PDF)
+    texts = [page.get_text() for page in source]
+    rect = source[0].rect
+    source.close()
+
+    digital = fitz.open()
+    for index in range(page_count):
+        text = texts[index % len(texts)]
+        if amended:
+            for old, new in AMENDMENTS.items():
+                text = text.replace(old, new)
+        page = digital.new_page(width=rect.width, height=rect.height)
+        page.insert_textbox(rect + (50, 50, -50, -50), text, fontsize=10)
+    data = digital.tobytes()
+    digital.close()
+    return data
+
+def build_scanned_pdf(page_count: int, dpi: int = 150, jpeg_quality: int = None) -> bytes:
+    """
+    Makes an image-only PDF by rasterizing the sample agreement, like a scanner would.
+
+    Args:
+        jpeg_quality: Store pages as JPEG, as most scanners do, instead of PNG. Each
+                      JPEG page also gets a unique speck, so no two pages share an
+                      image object the way repeated PNG pages do.
+    """
+    source = fitz.open(SAMPLE_PDF)
+    scanned = fitz.open()
+    for index in range(page_count):
+        page = source[index % len(source)]
+        pix = page.get_pixmap(dpi=dpi)
+        new_page = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        if jpeg_quality:
+            pix.set_pixel(index % pix.width, index // pix.width % pix.height, (0, 0, 0))
+            new_page.insert_image(new_page.rect, stream=pix.tobytes("jpeg", jpg_quality=jpeg_quality))
+            continue
+        new_page.insert_image(new_page.rect, stream=pix.tobytes("png"))
+    data = scanned.tobytes()
+    scanned.close()
+    source.close()
+    return data
@@ -0,0 +1,232 @@
+# backend/benchmarks/fakes.py
+#
+# Local stand-ins for Gemini, translation and text-to-speech so the app can be
+# load tested without calling Google services.
+
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from utils.ai_client import GeminiClient
+
+class FakeServiceError(Exception):
+    """
+    Raised by the stand-ins to simulate a failed upstream call.
+    """
+
+class ResourceExhausted(Exception):
+    """
+    Simulated quota error, named and coded like google.api_core's so the scheduler treats it as a 429.
+    """
+    code = 429
+
+class SharedQuota:
+    """
+    An upstream quota of `limit` calls per sliding `window_seconds`, shared by
+    every process forked after it is created. Calls over the quota raise
+    ResourceExhausted; accepted calls take latency_ms.
+    """
+
+    def __init__(self, limit: int, window_seconds: float = 1.0, latency_ms: float = 50.0):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.latency_ms = latency_ms
+        self._lock = multiprocessing.Lock()
+        # Ring of the accept times of the last `limit` calls; the oldest is at _next
+        self._accepted_at = multiprocessing.Array("d", limit, lock=False)
+        self._next = multiprocessing.Value("i", 0, lock=False)
+        self.accepted = multiprocessing.Value("i", 0, lock=False)
+        self.throttled = multiprocessing.Value("i", 0, lock=False)
+
+    def call(self):
+        with self._lock:
+            now = time.time()
+            oldest = self._next.value
+            if now - self._accepted_at[oldest] < self.window_seconds:
+                self.throttled.value += 1
+                raise ResourceExhausted("429 Quota exceeded (simulated)")
+            self._accepted_at[oldest] = now
+            self._next.value = (oldest + 1) % self.limit
+            self.accepted.value += 1
+        time.sleep(self.latency_ms / 1000)
+
+class FakeProfile:
+    """
+    How the stand-in services behave.
+
+    Args:
+        latency_ms: Mean time per call.
+        jitter_ms: Calls take latency_ms +/- up to jitter_ms, uniformly.
+        error_rate: Fraction of calls that raise FakeServiceError.
+        output_chars: Approximate size of each generated text (MP3 bytes for speech).
+        seed: Seed for the jitter and error draws, for repeatable runs.
+        image_latency_ms: Extra time per image sent in a call (vision requests).
+    """
+
+    def __init__(self, latency_ms=300.0, jitter_ms=100.0, error_rate=0.0, output_chars=2000, seed=None,
+                 image_latency_ms=0.0):
+        self.latency_ms = latency_ms
+        self.image_latency_ms = image_latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.output_chars = output_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Concurrency of calls in progress, for saturation reporting
+        self.calls = 0
+        self.active = 0
+        self.peak_active = 0
+        self.busy_seconds = 0.0
+
+    def call(self, images: int = 0):
+        """
+        Simulates one upstream call: waits out the latency and maybe fails.
+        """
+        with self._lock:
+            latency = self.latency_ms + self.image_latency_ms * images
+            delay = max(0.0, latency + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            self.calls += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.busy_seconds += delay
+        if failed:
+            raise FakeServiceError("simulated upstream failure")
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = 0
+            self.peak_active = self.active
+            self.busy_seconds = 0.0
+
+    def filler(self, chars: int = None) -> str:
+        sentence = "The tenant shall pay the rent on time and keep the property in good condition. "
+        chars = chars or self.output_chars
+        return (sentence * (chars // len(sentence) + 1))[:chars].strip()
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = []
+
+    def resolve(self):
+        pass
+
+class FakeGenerativeModel:
+    """
+    Answers generate_content calls with plausible output for each of the app's prompts.
+    """
+
+    def __init__(self, profile: FakeProfile):
+        self.profile = profile
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        parts = contents if isinstance(contents, list) else [contents]
+        self.profile.call(images=sum(1 for part in parts if isinstance(part, dict)))
+        text = self._respond(contents)
+        if not stream:
+            return FakeResponse(text)
+        # Streamed responses arrive in a handful of pieces
+        size = max(1, len(text) // 8)
+        return [FakeResponse(text[start:start + size]) for start in range(0, len(text), size)]
+
+    def _respond(self, contents) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        images = sum(1 for part in parts if isinstance(part, dict))
+        prompt = "\n".join(part for part in parts if isinstance(part, str))
+        per_item = max(200, self.profile.output_chars // 4)
+
+        if images > 1:
+            return "\n".join(f"<<<PAGE {page}>>>\n{self.profile.filler()}" for page in range(1, images + 1))
+        if images:
+            return self.profile.filler()
+        if '"overallRiskAssessment"' in prompt:
+            return json.dumps({
+                "overallRiskAssessment": {"rating": "Medium Risk", "summary": self.profile.filler(per_item)},
+                "newClauses": [],
+                "removedClauses": [],
+                "modifiedClauses": [{
+                    "clauseTitle": "Rent",
+                    "oldTextSummary": self.profile.filler(per_item),
+                    "newTextSummary": self.profile.filler(per_item),
+                    "riskAnalysis": self.profile.filler(per_item),
+                }],
+            })
+        if '"summary", "keyClauses", and "redFlags"' in prompt:
+            return "```json\n" + json.dumps({
+                "summary": self.profile.filler(per_item),
+                "keyClauses": [{"title": f"Clause {n}", "detail": self.profile.filler(per_item // 2)} for n in range(1, 4)],
+                "redFlags": [{"title": "Lock-in period", "detail": self.profile.filler(per_item // 2)}],
+            }) + "\n```"
+        if "JSON array" in prompt:
+            # Batched translation: echo every item back
+            payload = re.search(r"---\s*(\[.*\])\s*---", prompt, re.DOTALL)
+            items = json.loads(payload.group(1)) if payload else []
+            return json.dumps([{"id": item["id"], "text": f"[translated] {item['text']}"} for item in items])
+        return self.profile.filler()
+
+class FakeGeminiClient(GeminiClient):
+    """
+    The real GeminiClient (caching, chunking, diffing, prompt handling) on top of fake models.
+    """
+
+    def __init__(self, profile: FakeProfile, model_name: str = "fake-gemini"):
+        self.model_name = model_name
+        self.model = FakeGenerativeModel(profile)
+        self.vision_model = self.model
+
+def fake_translate_text(profile: FakeProfile):
+    """
+    Returns a translate_text(text, target_lang) stand-in.
+    """
+    def translate_text(text: str, target_lang: str) -> str:
+        profile.call()
+        return f"[{target_lang}] {text}"
+    return translate_text
+
+def fake_translate_packed(profile: FakeProfile):
+    """
+    Returns an ai_client._translate_packed(segments, target_lang) stand-in: one call per batch.
+    """
+    def translate_packed(segments: list, target_lang: str) -> list:
+        profile.call()
+        return [f"[{target_lang}] {text}" for text in segments]
+    return translate_packed
+
+def fake_synthesize(profile: FakeProfile):
+    """
+    Returns a TTS backend (text, lang) -> MP3 bytes stand-in. Output scales with the text like real speech.
+    """
+    def synthesize(text: str, lang: str) -> bytes:
+        profile.call()
+        return b"\xff\xfb\x90\x00" + bytes(len(text) * 40)
+    return synthesize
+
+def install_fakes(profile: FakeProfile, app_module=None) -> FakeGeminiClient:
+    """
+    Swaps the Gemini client, translate_text, the packed translation call behind
+    translate_batch and the TTS backend (used by /audio) for stand-ins, so
+    /translate/batch still measures the real packing, caching and concurrency.
+    Call before importing app, or pass the imported app module to patch it too.
+    """
+    from utils import ai_client
+    from utils.model_registry import set_client
+    from utils.tts import set_tts_backend
+
+    client = FakeGeminiClient(profile)
+    set_client(client)
+    translate_text = fake_translate_text(profile)
+    ai_client.translate_text = translate_text
+    ai_client._translate_packed = fake_translate_packed(profile)
+    set_tts_backend(fake_synthesize(profile))
+    if app_module is not None:
+        app_module.ai_client = client
+        app_module.translate_text = translate_text
+    return client
@@ -0,0 +1,107 @@
+# backend/benchmarks/ingestion.py
+#
+# Peak memory of extracting large scanned PDFs: several uploads are extracted
+# at once in a fresh process (OCR-only, extraction cache off, stand-in vision
+# model) and the growth of its peak RSS over the idle baseline is reported.
+# Linux only (reads /proc). No API calls are made.
+#
+# Usage, from backend/:
+#     python -m benchmarks.ingestion [pages] [concurrent_uploads] [scan_dpi]
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+class Upload:
+    """
+    A file-like upload that, like a request body, is not a file on disk.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+def _rss_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} missing from /proc/self/status")
+
+def _reset_peak_rss():
+    # Linux only: makes VmHWM (peak RSS) start again from the current RSS
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+def run(path: str, concurrent_uploads: int) -> dict:
+    # Runs in a spawned process so its peak RSS belongs to this measurement alone
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "false"
+    os.environ["METRICS_LOG_STAGES"] = "false"
+    from utils import pdf_processor
+    from utils.model_registry import set_client
+    from benchmarks.fakes import FakeProfile, FakeGeminiClient
+
+    pdf_processor.print = lambda *args, **kwargs: None
+    set_client(FakeGeminiClient(FakeProfile(latency_ms=20, jitter_ms=0, output_chars=1500)))
+    baseline = _rss_mb("VmRSS")
+    _reset_peak_rss()
+    results = []
+    errors = []
+
+    def extract():
+        upload = Upload(path)
+        try:
+            results.append(pdf_processor.extract_pages_from_pdf(upload, mode="ocr-only"))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            upload.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=extract) for _ in range(concurrent_uploads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    pages = sum(len(result) for result in results)
+    return {
+        "pages": pages,
+        "seconds": elapsed,
+        "pagesPerSecond": pages / elapsed,
+        "errors": errors,
+        "rssGrowthMB": _rss_mb("VmHWM") - baseline,
+    }
+
+def main(argv=None):
+    from benchmarks.documents import build_scanned_pdf
+
+    argv = sys.argv[1:] if argv is None else argv
+    page_count = int(argv[0]) if len(argv) > 0 else 60
+    concurrent_uploads = int(argv[1]) if len(argv) > 1 else 4
+    dpi = int(argv[2]) if len(argv) > 2 else 200
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        pdf_file.write(build_scanned_pdf(page_count, dpi=dpi, jpeg_quality=75))
+        pdf_file.flush()
+        size_mb = os.path.getsize(pdf_file.name) / 1024 / 1024
+        print(f"{concurrent_uploads} concurrent uploads of a {page_count}-page scan ({size_mb:.1f} MB, {dpi} dpi)")
+
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            result = pool.apply(run, (pdf_file.name, concurrent_uploads))
+
+    print(f"{'pages':>6} {'seconds':>8} {'pages/s':>8} {'RSS growth MB':>14}")
+    print(f"{result['pages']:>6} {result['seconds']:>8.1f} {result['pagesPerSecond']:>8.1f} {result['rssGrowthMB']:>14.1f}")
+    for error in sorted(set(result["errors"])):
+        print(f"failed: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# backend/benchmarks/load.py
+#
+# Offline load test of the Flask app. Gemini, translation and text-to-speech
+# are replaced by the stand-ins in benchmarks.fakes, documents are synthetic
+# PDFs, and every request bypasses the result and extraction caches so each
+# one does the full work.
+#
+# Usage, from backend/:
+#     python -m benchmarks.load [--scenarios analyze-digital,ask] [--concurrency 1,4,8]
+#                               [--latency-ms 300] [--error-rate 0.01] [--json results.json]
+#                               [--baseline previous.json]
+#
+# Reported per scenario and concurrency level:
+#     p50/p95     request latency
+#     pages/s     PDF pages processed per second (upload scenarios)
+#     cpu%        process CPU time per wall second; near 100% per core means the app itself is the bottleneck
+#     upstream    mean / peak number of stand-in service calls in flight, i.e. how saturated the workers keep upstream
+#     rss         process peak RSS so far (levels run in increasing order)
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.documents import build_digital_pdf, build_scanned_pdf
+
+QUESTION = "What happens to my security deposit if I leave before the lock-in period ends?"
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _ok(response) -> bool:
+    # Streamed bodies must be consumed for the request to be complete
+    response.get_data()
+    return response.status_code == 200
+
+class Scenarios:
+    """
+    Each scenario is a method taking (client, index) and returning (succeeded, pages_processed).
+    Text payloads carry a run-wide sequence number so no level is served from an earlier level's cache.
+    """
+
+    def __init__(self, app_module, page_count: int):
+        self.app = app_module
+        self.page_count = page_count
+        self.digital = build_digital_pdf(page_count)
+        self.amended = build_digital_pdf(page_count, amended=True)
+        self.scanned = build_scanned_pdf(page_count)
+        self._document_id = None
+        self._sequence = itertools.count()
+
+    def document_id(self, client) -> str:
+        # /ask and /translate work on a document that was analyzed once up front
+        if self._document_id is None:
+            response = client.post("/analyze", data={"document": (io.BytesIO(self.digital), "bench.pdf")})
+            self._document_id = response.get_json()["documentId"]
+        return self._document_id
+
+    def _analyze(self, client, pdf_bytes: bytes):
+        response = client.post(
+            "/analyze",
+            data={"document": (io.BytesIO(pdf_bytes), "bench.pdf")},
+            headers={"Cache-Control": "no-cache"},
+        )
+        return _ok(response), self.page_count
+
+    def analyze_digital(self, client, index):
+        return self._analyze(client, self.digital)
+
+    def analyze_scanned(self, client, index):
+        return self._analyze(client, self.scanned)
+
+    def ask(self, client, index):
+        response = client.post("/ask", json={"question": f"{QUESTION} ({next(self._sequence)})", "document_id": self.document_id(client)})
+        return _ok(response), 0
+
+    def compare(self, client, index):
+        response = client.post(
+            "/compare",
+            data={
+                "old_document": (io.BytesIO(self.digital), "old.pdf"),
+                "new_document": (io.BytesIO(self.amended), "new.pdf"),
+            },
+            headers={"Cache-Control": "no-cache"},
+        )
+        return _ok(response), 2 * self.page_count
+
+    def translate(self, client, index):
+        response = client.post("/translate", json={
+            "text": f"Request {next(self._sequence)}: the tenant must give one month's notice before leaving the property.",
+            "target_lang": "hi",
+            "section": "summary",
+        })
+        return _ok(response), 0
+
+    def audio(self, client, index):
+        # Every sentence is unique so the audio cache never answers
+        request_id = next(self._sequence)
+        text = " ".join(f"Request {request_id}, sentence {n}: the rent is due on the fifth of every month." for n in range(6))
+        response = client.post("/audio", json={"text": text, "lang": "en"})
+        return _ok(response), 0
+
+    def names(self) -> list:
+        return ["analyze-digital", "analyze-scanned", "ask", "compare", "translate", "audio"]
+
+    def get(self, name: str):
+        return getattr(self, name.replace("-", "_"))
+
+def run_level(app_module, profile, scenario, concurrency: int, request_count: int) -> dict:
+    """
+    Sends request_count requests from `concurrency` threads, each sending its next request as soon as the last finishes.
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, failures, pages = [], [0], [0]
+
+    def worker():
+        client = app_module.app.test_client()
+        while True:
+            index = next(counter)
+            if index >= request_count:
+                return
+            started = time.perf_counter()
+            try:
+                succeeded, processed = scenario(client, index)
+            except Exception:
+                succeeded, processed = False, 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if succeeded:
+                    pages[0] += processed
+                else:
+                    failures[0] += 1
+
+    profile.reset_counters()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": failures[0],
+        "p50Ms": 1000 * percentile(latencies, 0.50),
+        "p95Ms": 1000 * percentile(latencies, 0.95),
+        "requestsPerSecond": len(latencies) / wall,
+        "pagesPerSecond": pages[0] / wall,
+        "cpuPercent": 100 * cpu / wall,
+        "upstreamMean": profile.busy_seconds / wall,
+        "upstreamPeak": profile.peak_active,
+        # ru_maxrss is in kilobytes on Linux
+        "peakRssMb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def print_results(scenario_name: str, levels: list):
+    print(f"\n{scenario_name}")
+    print(f"{'conc':>5} {'reqs':>5} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>7} {'pages/s':>8} "
+          f"{'cpu%':>6} {'upstream':>10} {'rss MB':>7}")
+    for stats in levels:
+        upstream = f"{stats['upstreamMean']:.1f}/{stats['upstreamPeak']}"
+        print(f"{stats['concurrency']:>5} {stats['requests']:>5} {stats['errors']:>6} {stats['p50Ms']:>8.0f} "
+              f"{stats['p95Ms']:>8.0f} {stats['requestsPerSecond']:>7.2f} {stats['pagesPerSecond']:>8.2f} "
+              f"{stats['cpuPercent']:>6.0f} {upstream:>10} {stats['peakRssMb']:>7.0f}")
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Lists the (scenario, concurrency) levels whose p95 latency grew by more than tolerance over the baseline.
+    """
+    regressions = []
+    for scenario_name, levels in results.items():
+        previous = {stats["concurrency"]: stats for stats in baseline.get(scenario_name, [])}
+        for stats in levels:
+            before = previous.get(stats["concurrency"])
+            if before and stats["p95Ms"] > before["p95Ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario_name} x{stats['concurrency']}: p95 {before['p95Ms']:.0f} -> {stats['p95Ms']:.0f} ms"
+                )
+    return regressions
+
+def run(args) -> int:
+    """
+    Runs the selected scenarios at each concurrency level and reports them. Returns the exit code.
+    """
+    from benchmarks.fakes import FakeProfile, install_fakes
+
+    profile = FakeProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.output_chars, args.seed)
+    install_fakes(profile)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+        from utils import pdf_processor
+
+        install_fakes(profile, app_module)
+        pdf_processor.EXTRACTION_CACHE_ENABLED = False
+        scenarios = Scenarios(app_module, args.pages)
+
+    print(f"Stand-in services: {args.latency_ms:.0f} +/- {args.jitter_ms:.0f} ms, "
+          f"{args.error_rate:.0%} errors, {args.output_chars} chars; {args.pages}-page PDFs")
+
+    results = {}
+    for scenario_name in args.scenarios.split(","):
+        scenario = scenarios.get(scenario_name)
+        levels = []
+        for concurrency in sorted(int(level) for level in args.concurrency.split(",")):
+            # The app logs every page and call; keep that out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                levels.append(run_level(app_module, profile, scenario, concurrency, args.requests))
+        results[scenario_name] = levels
+        print_results(scenario_name, levels)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print(f"\nNo p95 regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test of the Saral Kanoon backend.")
+    parser.add_argument("--scenarios", default="analyze-digital,analyze-scanned,ask,compare,translate,audio")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level")
+    parser.add_argument("--pages", type=int, default=8, help="pages per synthetic PDF")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output-chars", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    args = parser.parse_args(argv)
+
+    # Caches and stores go to a scratch directory so runs start cold. The
+    # cache module reads CACHE_DIR on import, so nothing from utils is imported before this.
+    scratch_dir = None
+    if "CACHE_DIR" not in os.environ:
+        scratch_dir = os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="saralkanoon-bench-")
+    # The stand-ins have no quota; calls still pass through the scheduler, just without a cap
+    os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "1000000000")
+    try:
+        return run(args)
+    finally:
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
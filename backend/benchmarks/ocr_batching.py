@@ -0,0 +1,57 @@
+# backend/benchmarks/ocr_batching.py
+#
+# Measures scanned-PDF throughput for different PDF_OCR_BATCH_PAGES values
+# against a stand-in vision model with a fixed cost per request and per page.
+# No API calls are made.
+#
+# Usage, from backend/:
+#     python -m benchmarks.ocr_batching [pages] [request_ms] [page_ms]
+
+import contextlib
+import io
+import sys
+import time
+from utils import pdf_processor
+from utils.model_registry import set_client
+from benchmarks.documents import build_scanned_pdf
+from benchmarks.fakes import FakeGeminiClient, FakeProfile
+
+BATCH_SIZES = (1, 2, 4, 8)
+
+def run(pdf_bytes: bytes, batch_pages: int, request_ms: float, page_ms: float) -> dict:
+    # A fixed cost per request plus one per page, answered in the multi-page format
+    profile = FakeProfile(latency_ms=request_ms, jitter_ms=0, output_chars=400, image_latency_ms=page_ms)
+    set_client(FakeGeminiClient(profile, model_name="benchmark"))
+
+    pdf_processor.OCR_BATCH_PAGES = batch_pages
+    started = time.perf_counter()
+    pages = pdf_processor.extract_pages_from_pdf(io.BytesIO(pdf_bytes), mode="ocr-only")
+    elapsed = time.perf_counter() - started
+    return {
+        "batchPages": batch_pages,
+        "seconds": elapsed,
+        "pagesPerSecond": len(pages) / elapsed,
+        "requests": profile.calls,
+        "failed": sum(1 for page in pages if page["method"] == "failed"),
+    }
+
+def main(page_count: int = 40, request_ms: float = 800, page_ms: float = 400):
+    # Every run has to reach the model
+    pdf_processor.EXTRACTION_CACHE_ENABLED = False
+    pdf_bytes = build_scanned_pdf(page_count)
+
+    results = []
+    for batch_pages in BATCH_SIZES:
+        # Keep the per-request logging out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(run(pdf_bytes, batch_pages, request_ms, page_ms))
+
+    print(f"{page_count} scanned pages, {pdf_processor.OCR_WORKERS} OCR workers, "
+          f"{request_ms:.0f} ms per request + {page_ms:.0f} ms per page\n")
+    print(f"{'batch':>5} {'requests':>9} {'seconds':>8} {'pages/s':>8} {'failed':>7}")
+    for stats in results:
+        print(f"{stats['batchPages']:>5} {stats['requests']:>9} {stats['seconds']:>8.2f} "
+              f"{stats['pagesPerSecond']:>8.2f} {stats['failed']:>7}")
+
+if __name__ == "__main__":
+    main(*(float(arg) if index else int(arg) for index, arg in enumerate(sys.argv[1:4])))
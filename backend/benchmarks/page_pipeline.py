@@ -0,0 +1,86 @@
+# backend/benchmarks/page_pipeline.py
+#
+# Compares the old page image pipeline (RGB pixmap -> PNG -> PIL grayscale/resize
+# -> JPEG, decoded again before the vision call) with the single-pass one in
+# pdf_processor.render_page_image. No API calls are made.
+#
+# Usage, from backend/:
+#     python -m benchmarks.page_pipeline [pages] [scan_dpi]
+
+import concurrent.futures
+import io
+import multiprocessing
+import resource
+import sys
+import time
+import fitz  # PyMuPDF
+from utils.pdf_processor import render_page_image
+from benchmarks.documents import build_scanned_pdf
+
+def legacy_pipeline(page) -> tuple:
+    """
+    The pipeline before the rework, including the extra decode in extract_text_from_image.
+    """
+    from PIL import Image
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(1.0, 1.0))
+    # Grayscale, fit into 1024x1024, re-encode as JPEG
+    img = Image.open(io.BytesIO(pix.tobytes("png"))).convert("L")
+    img.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=85, optimize=True)
+    image_bytes = output.getvalue()
+    Image.open(io.BytesIO(image_bytes)).load()
+    return image_bytes, "image/png"
+
+def single_pass_pipeline(page) -> tuple:
+    return render_page_image(page)
+
+PIPELINES = {"legacy": legacy_pipeline, "single-pass": single_pass_pipeline}
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_pipeline(name: str, pdf_bytes: bytes) -> dict:
+    """
+    Renders every page with one pipeline. Runs in a fresh process so peak RSS is its own.
+    """
+    pipeline = PIPELINES[name]
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    rss_before = _max_rss_mb()
+    cpu_times, wall_times, sizes, long_edges = [], [], [], []
+    for page in doc:
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        image_bytes, _ = pipeline(page)
+        cpu_times.append(time.process_time() - cpu_started)
+        wall_times.append(time.perf_counter() - wall_started)
+        sizes.append(len(image_bytes))
+        long_edges.append(max(fitz.Pixmap(image_bytes).irect[2:]))
+    doc.close()
+    pages = len(sizes)
+    return {
+        "pipeline": name,
+        "pages": pages,
+        "cpuMsPerPage": 1000 * sum(cpu_times) / pages,
+        "wallMsPerPage": 1000 * sum(wall_times) / pages,
+        "kbPerPage": sum(sizes) / pages / 1024,
+        "longEdgePx": max(long_edges),
+        "peakRssGrowthMb": _max_rss_mb() - rss_before,
+    }
+
+def main(page_count: int = 10, scan_dpi: int = 150):
+    pdf_bytes = build_scanned_pdf(page_count, scan_dpi)
+    print(f"{page_count} scanned pages at {scan_dpi} dpi ({len(pdf_bytes) / 1024:.0f} KB PDF)\n")
+    print(f"{'pipeline':<12} {'cpu ms/page':>12} {'wall ms/page':>13} {'KB/page':>9} {'long edge':>10} {'peak RSS +MB':>13}")
+    context = multiprocessing.get_context("fork")
+    for name in PIPELINES:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            stats = pool.submit(run_pipeline, name, pdf_bytes).result()
+        print(
+            f"{stats['pipeline']:<12} {stats['cpuMsPerPage']:>12.1f} {stats['wallMsPerPage']:>13.1f} "
+            f"{stats['kbPerPage']:>9.1f} {stats['longEdgePx']:>10} {stats['peakRssGrowthMb']:>13.1f}"
+        )
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,161 @@
+# backend/benchmarks/startup.py
+#
+# How long a new worker takes before it has answered its first requests:
+# importing the app, then a first /analyze of a digital PDF (which loads
+# PyMuPDF and the Gemini SDK) and a first /ask about it (which loads NumPy and
+# builds the retrieval index). "cold" is a fresh process that does all of that itself, like a
+# worker without PRELOAD_APP. "preloaded" is forked from a process that
+# imported the app and ran preload(), like a worker with PRELOAD_APP=true.
+# Also reports each worker's private (unshared) memory afterwards. The Gemini
+# SDK is loaded and configured as usual, but its calls are answered by a local
+# stand-in, so no API calls are made. Linux only (fork, reads /proc).
+#
+# Usage, from backend/:
+#     python -m benchmarks.startup [runs] [pages]
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+QUESTION = "How much notice do I have to give before moving out?"
+
+def _private_mb() -> float:
+    # Memory only this process uses: pages shared with the parent are not counted
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total / 1024
+
+def _prepare_worker():
+    # The registry still loads and configures the SDK and builds the model
+    # object; only the calls made with it are answered locally
+    from utils import ai_client
+    from benchmarks.fakes import FakeProfile, FakeGenerativeModel
+
+    registry_get_model = ai_client.get_model
+    stand_in = FakeGenerativeModel(FakeProfile(latency_ms=0, jitter_ms=0))
+
+    def get_model(model_name):
+        registry_get_model(model_name)
+        return stand_in
+
+    ai_client.get_model = get_model
+
+def first_requests(app_module, pdf_bytes: bytes) -> dict:
+    """
+    Times this process's first /analyze and first /ask, in seconds.
+    """
+    client = app_module.app.test_client()
+    # Keep the page and request log lines out of the table
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = client.post("/analyze", data={"document": (io.BytesIO(pdf_bytes), "agreement.pdf")})
+        analyze_seconds = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze failed: {response.get_json()}")
+
+        started = time.perf_counter()
+        response = client.post("/ask", json={"question": QUESTION, "document_id": response.get_json()["documentId"]})
+        ask_seconds = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"/ask failed: {response.get_json()}")
+    return {"analyze": analyze_seconds, "ask": ask_seconds}
+
+def cold_worker(pdf_path: str) -> dict:
+    # Runs in a spawned process, so nothing has been imported yet
+    started = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - started
+
+    _prepare_worker()
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    return {"import": import_seconds, **first_requests(app, pdf_bytes), "privateMB": _private_mb()}
+
+def preloaded_worker(pdf_path: str) -> dict:
+    # Runs in a spawned process that plays the gunicorn master, then forks the worker
+    started = time.perf_counter()
+    import app
+    from utils.preload import preload
+
+    _prepare_worker()
+    preload()
+    master_seconds = time.perf_counter() - started
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(reader)
+        try:
+            result = {**first_requests(app, pdf_bytes), "privateMB": _private_mb()}
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        with os.fdopen(writer, "w") as pipe:
+            json.dump(result, pipe)
+        os._exit(0)
+
+    os.close(writer)
+    with os.fdopen(reader) as pipe:
+        result = json.load(pipe)
+    os.waitpid(pid, 0)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return {"import": 0.0, **result, "master": master_seconds}
+
+def run(mode: str, pdf_path: str, runs: int) -> dict:
+    target = cold_worker if mode == "cold" else preloaded_worker
+    results = []
+    for _ in range(runs):
+        # A new interpreter per run, so no run inherits another's imports
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            results.append(pool.apply(target, (pdf_path,)))
+    median = {key: statistics.median(result[key] for result in results) for key in results[0]}
+    median["ready"] = median["import"] + median["analyze"] + median["ask"]
+    return median
+
+def main(argv=None):
+    from benchmarks.documents import build_digital_pdf
+
+    argv = sys.argv[1:] if argv is None else argv
+    runs = int(argv[0]) if len(argv) > 0 else 3
+    # Long enough for /ask to go through retrieval
+    page_count = int(argv[1]) if len(argv) > 1 else 8
+
+    scratch_dir = tempfile.mkdtemp(prefix="saralkanoon-startup-")
+    # Settings for the spawned processes: nothing cached between runs, no stage log lines
+    os.environ.update({
+        "GEMINI_API_KEY": "benchmark",
+        "CACHE_DIR": scratch_dir,
+        "EXTRACTION_CACHE_ENABLED": "false",
+        "RESULT_CACHE_ENABLED": "false",
+        "METRICS_LOG_STAGES": "false",
+    })
+    try:
+        pdf_path = os.path.join(scratch_dir, "agreement.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(build_digital_pdf(page_count))
+
+        print(f"Median of {runs} runs, {page_count}-page digital PDF")
+        print(f"{'worker':<10} {'import s':>9} {'1st analyze s':>14} {'1st ask s':>10} {'ready s':>8} {'private MB':>11}")
+        for mode in ("cold", "preloaded"):
+            result = run(mode, pdf_path, runs)
+            print(f"{mode:<10} {result['import']:>9.3f} {result['analyze']:>14.3f} {result['ask']:>10.3f} "
+                  f"{result['ready']:>8.3f} {result['privateMB']:>11.1f}")
+            if "master" in result:
+                print(f"(the master spent {result['master']:.3f}s importing the app and preloading, once for all workers)")
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# backend/benchmarks/throttling.py
+#
+# Several worker processes share one upstream quota, as gunicorn workers and
+# job processes share the Gemini API key. Compares the old per-call retry
+# (two attempts, fixed 2 s sleep) with the shared scheduler: how many calls
+# hit 429, how many fail for good, and how long the whole workload takes.
+# No API calls are made.
+#
+# Usage, from backend/:
+#     python -m benchmarks.throttling [processes] [threads] [calls] [quota_per_second]
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.fakes import SharedQuota
+from utils import scheduler as scheduler_module
+from utils.scheduler import Scheduler
+
+def fixed_retry(quota: SharedQuota):
+    # What ocr_page_image did before the scheduler
+    for attempt in range(2):
+        try:
+            return quota.call()
+        except Exception:
+            if attempt == 1:
+                raise
+            time.sleep(2)
+
+def worker(strategy: str, quota: SharedQuota, threads: int, calls: int, db_path: str, results):
+    scheduler = Scheduler(path=db_path, requests_per_minute=quota.limit * 60 / quota.window_seconds,
+                          window_seconds=quota.window_seconds)
+    failed = [0]
+    lock = threading.Lock()
+
+    def run_calls():
+        for _ in range(calls):
+            try:
+                if strategy == "scheduler":
+                    scheduler.call(quota.call, stage_name="benchmark")
+                else:
+                    fixed_retry(quota)
+            except Exception:
+                with lock:
+                    failed[0] += 1
+
+    pool = [threading.Thread(target=run_calls) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(failed[0])
+
+def run(strategy: str, processes: int, threads: int, calls: int, quota_per_second: int) -> dict:
+    context = multiprocessing.get_context("fork")
+    quota = SharedQuota(quota_per_second, window_seconds=1.0)
+    scratch_dir = tempfile.mkdtemp(prefix="saralkanoon-throttle-")
+    results = context.Queue()
+    started = time.perf_counter()
+    try:
+        pool = [
+            context.Process(target=worker, args=(strategy, quota, threads, calls,
+                                                 os.path.join(scratch_dir, "scheduler.sqlite3"), results))
+            for _ in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        failed = sum(results.get() for _ in pool)
+        for process in pool:
+            process.join()
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    total = processes * threads * calls
+    return {
+        "strategy": strategy,
+        "calls": total,
+        "failed": failed,
+        "throttled": quota.throttled.value,
+        "seconds": time.perf_counter() - started,
+    }
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    processes = int(argv[0]) if len(argv) > 0 else 4
+    threads = int(argv[1]) if len(argv) > 1 else 8
+    calls = int(argv[2]) if len(argv) > 2 else 10
+    quota_per_second = int(argv[3]) if len(argv) > 3 else 40
+    # Keep the retry chatter out of the table
+    scheduler_module.print = lambda *args, **kwargs: None
+
+    total = processes * threads * calls
+    print(f"{processes} processes x {threads} threads x {calls} calls = {total} calls, "
+          f"quota {quota_per_second}/s (best case {total / quota_per_second:.1f}s)")
+    print(f"{'strategy':<10} {'failed':>7} {'429s':>6} {'seconds':>8}")
+    for strategy in ("fixed", "scheduler"):
+        result = run(strategy, processes, threads, calls, quota_per_second)
+        print(f"{result['strategy']:<10} {result['failed']:>7} {result['throttled']:>6} {result['seconds']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,59 @@
 # Gunicorn configuration file
+import os
+
 workers = 4
 timeout = 120  # 2 minutes timeout
-worker_class = 'sync'
-bind = '0.0.0.0:5000'
\ No newline at end of file
+bind = '0.0.0.0:5000'
+
+# SERVING_MODE=threads (default): gthread workers with 4 threads each, so at
+# most 16 requests run at once. They keep heartbeating while a request runs,
+# so long streaming responses (/analyze/stream, /ask/stream) are not killed at the timeout.
+# SERVING_MODE=async: gevent workers, where every request is a greenlet and
+# waiting on Gemini or gTTS yields to the others, so each worker can hold
+# WORKER_CONNECTIONS requests in flight. Gemini is then called over REST,
+# which cooperates with gevent (gRPC does not).
+# Either way each request is stopped after REQUEST_TIMEOUT_SECONDS.
+serving_mode = os.getenv("SERVING_MODE", "threads")
+if serving_mode == "async":
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv("WORKER_CONNECTIONS", "500"))
+else:
+    worker_class = 'gthread'
+    threads = 4
+
+# PRELOAD_APP=true: the app is imported once in the master, which also loads the
+# Gemini SDK, PyMuPDF and NumPy (utils/preload.py), and the HTTP and job
+# workers are forked from it. Workers then start and serve their first requests
+# without importing anything, and share those pages copy-on-write. Code changes
+# need a full restart instead of a HUP. Otherwise each worker imports the app
+# itself and the SDKs on first use.
+preload_app = os.getenv("PRELOAD_APP", "false").lower() == "true"
+if preload_app and serving_mode == "async":
+    # The app would be imported before the gevent workers patch the standard
+    # library, leaving it with blocking locks and sockets, so patch it here first
+    from gevent import monkey
+    monkey.patch_all()
+
+# Job workers for /jobs/* run in their own processes next to the HTTP workers,
+# under a supervisor that restarts any that exit.
+# Set JOB_WORKERS=0 when running them separately with `python -m utils.jobs`.
+job_workers = int(os.getenv("JOB_WORKERS", "2"))
+_job_supervisor = []
+
+def when_ready(server):
+    # /metrics sums the snapshots of all processes, so drop those of earlier runs
+    from utils.metrics import reset_metrics_dir
+    reset_metrics_dir()
+    if preload_app:
+        from utils.preload import preload
+        preload()
+        server.log.info("Preloaded shared state for the workers")
+    if job_workers > 0:
+        from utils.jobs import start_supervisor
+        _job_supervisor.append(start_supervisor(job_workers))
+        server.log.info(f"Started {job_workers} job workers")
+
+def on_exit(server):
+    if _job_supervisor:
+        from utils.jobs import stop_supervisor
+        stop_supervisor(_job_supervisor[0])
@@ -0,0 +1,7 @@
+# backend/utils/__init__.py
+
+from dotenv import load_dotenv
+
+# Every module reads its settings from the environment when it is imported, so
+# the .env file is loaded here, once, before any of them
+load_dotenv()
@@ -1,45 +1,311 @@
 # backend/utils/ai_client.py
 
 import os
+import re
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
-from gtts import gTTS
+import difflib
+import concurrent.futures
+from .cache import DiskCache, sha256_hex
+from .compare import diff_documents, has_changes, format_changes
+from .clauses import split_clauses, group_clauses
+from .clause_rules import RULES_VERSION, prescreen, prescreen_hints, fast_analysis
+from .model_registry import get_model, require_api_key, DEFAULT_MODEL
+from .metrics import stage, traced
+from .scheduler import scheduler, is_timeout, CircuitOpen, DEFAULT_LANE
+from .deadlines import DeadlineExceeded, remaining_seconds
 
-# Load environment variables from a .env file
-load_dotenv()
+# --- Result Cache ---
+# Bump a prompt version whenever its prompt text changes so stale results are not served.
+ANALYSIS_PROMPT_VERSION = "1"
+COMPARE_PROMPT_VERSION = "2"
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+result_cache = DiskCache(
+    "results",
+    int(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    ttl_seconds=int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    memory_max_bytes=int(os.getenv("RESULT_CACHE_MEMORY_MB", "8")) * 1024 * 1024,
+)
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses whitespace so that re-extracted copies of the same document hash the same.
+    """
+    return " ".join(text.split())
+
+ANALYSIS_SECTIONS = ("summary", "keyClauses", "redFlags")
+
+# --- Long Document Analysis ---
+# Documents longer than LONG_DOCUMENT_CHARS are analyzed map-reduce style:
+# clause-aligned chunks are analyzed concurrently, then the findings are merged.
+LONG_DOCUMENT_CHARS = int(os.getenv("LONG_DOCUMENT_CHARS", "40000"))
+ANALYSIS_CHUNK_CHARS = int(os.getenv("ANALYSIS_CHUNK_CHARS", "15000"))
+ANALYSIS_PARALLELISM = int(os.getenv("ANALYSIS_PARALLELISM", "4"))
+MAX_MERGED_KEY_CLAUSES = 8
+DUPLICATE_TITLE_SIMILARITY = 0.85
+
+# --- Rule Pre-screen ---
+# The local clause rule library (clause_rules.py) finds the common clauses in
+# milliseconds. With CLAUSE_RULE_HINTS its findings are added to the analysis
+# prompt for the model to check and build on. "fast" analysis returns them as
+# the whole result without calling the model; "full" is the model's analysis.
+CLAUSE_RULE_HINTS = os.getenv("CLAUSE_RULE_HINTS", "true").lower() == "true"
+ANALYSIS_MODES = ("full", "fast")
+DEFAULT_ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "full").lower()
+
+def fast_analysis_stream(document_text: str):
+    """
+    "fast" analysis in analyze_document_stream's event shape: each section, then ("result", analysis).
+    Needs no model, so it also runs without an API key.
+    """
+    result = fast_analysis(document_text)
+    for section in ANALYSIS_SECTIONS:
+        yield section, result.get(section)
+    yield "result", result
+
+def merge_findings(finding_lists: list) -> list:
+    """
+    Merges keyClauses/redFlags from several chunks, dropping repeats of the
+    same title (keeping the more detailed explanation) and preserving order.
+    """
+    merged = []
+    keys = []
+    for findings in finding_lists:
+        for finding in findings or []:
+            if not isinstance(finding, dict) or not finding.get("title"):
+                continue
+            key = " ".join(re.findall(r"\w+", finding["title"].lower()))
+            for index, existing in enumerate(keys):
+                if key == existing or difflib.SequenceMatcher(None, key, existing).ratio() >= DUPLICATE_TITLE_SIMILARITY:
+                    if len(finding.get("detail", "")) > len(merged[index].get("detail", "")):
+                        merged[index] = finding
+                    break
+            else:
+                keys.append(key)
+                merged.append(finding)
+    return merged
+
+def clean_json_response(text: str) -> str:
+    """
+    Strips the markdown code fences the model sometimes wraps JSON in.
+    """
+    return text.strip().replace("```json", "").replace("```", "").strip()
+
+# --- Model Calls ---
+# Every model call goes through generate / generate_stream: it is queued in the
+# shared scheduler (rate limits, priority lanes, backoff, circuit breaker) and
+# timed and sized (prompt and response characters, image bytes, tokens) as one stage.
+
+# Scheduler lane per call: interactive answers first, page OCR last
+CALL_LANES = {
+    "ask_call": "interactive",
+    "translate_call": "interactive",
+    "analyze_call": "standard",
+    "compare_call": "standard",
+    "analyze_chunk_call": "standard",
+    "summary_merge_call": "standard",
+    "vision_call": "bulk",
+}
+# Token estimate used to reserve rate-limit capacity before the real count is known
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+EXPECTED_OUTPUT_TOKENS = 1024
+
+def _prompt_size(contents) -> tuple:
+    parts = contents if isinstance(contents, list) else [contents]
+    chars = sum(len(part) for part in parts if isinstance(part, str))
+    images = [part for part in parts if isinstance(part, dict)]
+    image_bytes = sum(len(part["data"]) for part in images)
+    estimated_tokens = chars // CHARS_PER_TOKEN + TOKENS_PER_IMAGE * len(images) + EXPECTED_OUTPUT_TOKENS
+    return chars, image_bytes or None, estimated_tokens
+
+def _record_usage(span: dict, response, estimated_tokens: int):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    span["tokens_in"] = getattr(usage, "prompt_token_count", None)
+    span["tokens_out"] = getattr(usage, "candidates_token_count", None)
+    total = getattr(usage, "total_token_count", None)
+    if isinstance(total, int):
+        scheduler.settle(total - estimated_tokens)
+
+def _call_options() -> dict:
+    # Inside a request the network timeout is whatever is left of its deadline
+    remaining = remaining_seconds()
+    return {} if remaining is None else {"request_options": {"timeout": max(1.0, remaining)}}
+
+def _raise_if_timed_out(error):
+    """
+    Re-raises a deadline or timeout error as DeadlineExceeded, so that it reaches
+    the route (HTTP 504) instead of being turned into an error result. Call it
+    first in a handler that catches every exception from a model call.
+    """
+    if isinstance(error, DeadlineExceeded):
+        raise error
+    if is_timeout(error):
+        raise DeadlineExceeded(f"Gemini call timed out: {error}") from error
+
+def generate(model, contents, stage_name: str):
+    """
+    Calls model.generate_content(contents) through the scheduler as the metrics stage stage_name.
+    """
+    chars, image_bytes, estimated_tokens = _prompt_size(contents)
+    with stage(stage_name, chars_in=chars, bytes=image_bytes) as span:
+        response = scheduler.call(
+            lambda: model.generate_content(contents, **_call_options()),
+            CALL_LANES.get(stage_name, DEFAULT_LANE), estimated_tokens, stage_name,
+        )
+        span["chars_out"] = len(response.text)
+        _record_usage(span, response, estimated_tokens)
+        return response
+
+def generate_stream(model, contents, stage_name: str):
+    """
+    Streaming generate: yields the response chunks; the stage ends with the last chunk.
+    Only starting the stream is retried, never a stream that already produced output.
+    """
+    chars, image_bytes, estimated_tokens = _prompt_size(contents)
+    with stage(stage_name, chars_in=chars, bytes=image_bytes) as span:
+        response = scheduler.call(
+            lambda: model.generate_content(contents, stream=True, **_call_options()),
+            CALL_LANES.get(stage_name, DEFAULT_LANE), estimated_tokens, stage_name,
+        )
+        received = 0
+        chunk = None
+        for chunk in response:
+            received += len(chunk.text)
+            yield chunk
+        span["chars_out"] = received
+        _record_usage(span, chunk, estimated_tokens)
+
+def parse_model_json(text: str, call: str):
+    """
+    Strips code fences from a model response and parses it, timed as a "json_parse" stage.
+    """
+    with stage("json_parse", call=call, chars_in=len(text)):
+        return json.loads(clean_json_response(text))
+
+def completed_sections(partial_json: str, keys, done: set) -> list:
+    """
+    Finds top-level values in a partially streamed JSON object that are already complete.
+
+    Returns:
+        A list of (key, value) pairs for keys not yet in done, in the order found.
+    """
+    decoder = json.JSONDecoder()
+    found = []
+    for key in keys:
+        if key in done:
+            continue
+        marker = partial_json.find(f'"{key}"')
+        if marker == -1:
+            continue
+        colon = partial_json.find(":", marker + len(key) + 2)
+        if colon == -1:
+            continue
+        start = colon + 1
+        while start < len(partial_json) and partial_json[start].isspace():
+            start += 1
+        try:
+            value, end = decoder.raw_decode(partial_json, start)
+        except json.JSONDecodeError:
+            continue
+        # A value at the very end of the buffer may still be growing (e.g. a number)
+        if end >= len(partial_json) and not isinstance(value, (str, list, dict)):
+            continue
+        done.add(key)
+        found.append((key, value))
+    return found
+
+# Multi-page OCR responses mark the start of each page with a line like "<<<PAGE 3>>>"
+PAGE_MARKER = re.compile(r"^\s*<<<PAGE (\d+)>>>\s*$", re.MULTILINE)
+
+def split_page_texts(response_text: str, page_count: int, truncated: bool = False) -> list:
+    """
+    Splits a multi-page OCR response on its page markers.
+
+    Args:
+        response_text: The model output
+        page_count: How many pages were sent
+        truncated: Whether the output hit the token limit, in which case the last page found may be cut off
+
+    Returns:
+        list: page_count entries in page order; None for pages missing from the response.
+    """
+    texts = [None] * page_count
+    markers = list(PAGE_MARKER.finditer(response_text))
+    for index, marker in enumerate(markers):
+        page = int(marker.group(1))
+        if not 1 <= page <= page_count:
+            continue
+        end = markers[index + 1].start() if index + 1 < len(markers) else len(response_text)
+        if truncated and index == len(markers) - 1:
+            break
+        texts[page - 1] = response_text[marker.end():end].strip()
+    return texts
+
+def result_cache_stats() -> dict:
+    """
+    Hit/miss counters for cached analysis and comparison results.
+    """
+    return result_cache.stats()
 
 class GeminiClient:
     """
     A client to interact with the Google Gemini API, specifically tuned
     for the Saral Kanoon application.
     """
-    def __init__(self, model_name="gemini-2.5-flash"):
+    # Set to use other model objects (e.g. local stand-ins) instead of the registry's
+    _model = None
+    _vision_model = None
+
+    def __init__(self, model_name=DEFAULT_MODEL):
         """
-        Initializes the Gemini client.
+        Initializes the Gemini client. Prefer model_registry.get_client(), which
+        shares one client per worker process instead of building a new one.
+        The SDK is only loaded when the first model call is made.
+
+        Raises:
+            ValueError: If GEMINI_API_KEY is not set.
         """
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
-        
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(model_name)
+        require_api_key()
+        self.model_name = model_name
+
+    # Models are looked up in the process-wide registry on each use rather than
+    # kept here, so a client created before a fork (PRELOAD_APP) uses the
+    # forked worker's own models and connections
+    @property
+    def model(self):
+        return self._model if self._model is not None else get_model(self.model_name)
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    @property
+    def vision_model(self):
         # Initialize vision model for PDF processing
-        self.vision_model = genai.GenerativeModel('gemini-2.5-flash')
+        return self._vision_model if self._vision_model is not None else get_model(DEFAULT_MODEL)
+
+    @vision_model.setter
+    def vision_model(self, model):
+        self._vision_model = model
 
-    def extract_text_from_image(self, image_bytes: bytes) -> str:
+    def extract_text_from_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
         """
         Extracts text from a PDF page using Gemini's vision capabilities.
         
         Args:
             image_bytes: The bytes of the PDF page rendered as an image
+            mime_type: The format image_bytes are encoded in
             
         Returns:
-            str: Extracted text from the image
+            str: Extracted text from the image, empty if the model failed on this page
+
+        Raises:
+            DeadlineExceeded: If the request ran out of time or was cancelled
+            CircuitOpen: If Gemini calls are paused, so the page is reported as failed rather than blank
         """
-        from PIL import Image
-        import io
-        
         prompt = """
         Extract all text from this image. This is a page from a legal document.
         Return only the extracted text, maintaining the original formatting where possible.
@@ -47,26 +313,258 @@ class GeminiClient:
         """
         
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Create image parts for Gemini
-            image_part = {"mime_type": "image/png", "data": image_bytes}
+            # The page is sent as encoded, without decoding it again
+            image_part = {"mime_type": mime_type, "data": image_bytes}
             
             # Generate content with proper image formatting
-            response = self.vision_model.generate_content([prompt, image_part])
+            response = generate(self.vision_model, [prompt, image_part], "vision_call")
             response.resolve()  # Ensure the response is complete
             return response.text.strip()
+        except (DeadlineExceeded, CircuitOpen):
+            raise
         except Exception as e:
             print(f"Error in vision processing: {e}")
             return ""
 
-    def analyze_document(self, document_text: str) -> dict:
+    def extract_text_from_images(self, images: list) -> list:
+        """
+        Extracts text from several PDF pages with a single vision request.
+
+        Args:
+            images: (image_bytes, mime_type) tuples, one per page, in page order
+
+        Returns:
+            list: The text of each page in order, None for pages the response
+                  did not (completely) include, e.g. because it was truncated.
+
+        Raises:
+            Exception: If the request itself fails
+        """
+        prompt = f"""
+        Extract all text from these {len(images)} images. They are consecutive pages from a legal document, in order.
+        For each page, first write a line containing only <<<PAGE n>>> (n is 1 for the first image), followed by that page's text.
+        Maintain the original formatting where possible.
+        Do not include any additional commentary or analysis.
+        """
+
+        parts = [prompt]
+        for page, (image_bytes, mime_type) in enumerate(images, 1):
+            # Labelling each image keeps the page numbering unambiguous
+            parts.append(f"<<<PAGE {page}>>>")
+            parts.append({"mime_type": mime_type, "data": image_bytes})
+
+        response = generate(self.vision_model, parts, "vision_call")
+        response.resolve()
+        finish_reason = getattr(response.candidates[0].finish_reason, "name", "") if response.candidates else ""
+        return split_page_texts(response.text, len(images), truncated=finish_reason == "MAX_TOKENS")
+
+    def analyze_document(self, document_text: str, use_cache: bool = True, mode: str = None) -> dict:
         """
         Analyzes the full text of a legal document and returns a structured JSON.
+        Results are cached by document hash, prompt version and model unless use_cache is False.
+        In "fast" mode (see ANALYSIS_MODES) only the local rule library is used.
         """
+        if (mode or DEFAULT_ANALYSIS_MODE) == "fast":
+            return fast_analysis(document_text)
+
+        cache_key = self._analysis_cache_key(document_text)
+        if use_cache and RESULT_CACHE_ENABLED:
+            cached = result_cache.get_json(cache_key)
+            if cached is not None:
+                return cached
+
+        if len(document_text) > LONG_DOCUMENT_CHARS:
+            result = self._analyze_long_document(document_text)
+            if RESULT_CACHE_ENABLED and "error" not in result:
+                result_cache.set_json(cache_key, result)
+            return result
+
+        prompt = self._analysis_prompt(document_text)
+        try:
+            response = generate(self.model, prompt, "analyze_call")
+            result = parse_model_json(response.text, "analyze")
+            if RESULT_CACHE_ENABLED:
+                result_cache.set_json(cache_key, result)
+            return result
+        except json.JSONDecodeError:
+            print("Error: Failed to decode JSON from AI response.")
+            return {"error": "Could not parse the AI's analysis."}
+        except Exception as e:
+            _raise_if_timed_out(e)
+            print(f"Error during analysis: {e}")
+            return {"error": "An error occurred during document analysis."}
+
+    def analyze_document_stream(self, document_text: str, use_cache: bool = True, mode: str = None):
+        """
+        Streaming version of analyze_document. Unless the result is cached, first
+        yields ("prescreen", {"keyClauses", "redFlags"}) from the local rule library,
+        then ("summary" | "keyClauses" | "redFlags", value) as soon as each section
+        has been generated, then ("result", full_analysis) or ("error", message).
+        """
+        if (mode or DEFAULT_ANALYSIS_MODE) == "fast":
+            yield from fast_analysis_stream(document_text)
+            return
+
+        cache_key = self._analysis_cache_key(document_text)
+        if use_cache and RESULT_CACHE_ENABLED:
+            cached = result_cache.get_json(cache_key)
+            if cached is not None:
+                for section in ANALYSIS_SECTIONS:
+                    yield section, cached.get(section)
+                yield "result", cached
+                return
+
+        # The rule findings are ready long before the model's first section
+        findings = prescreen(document_text)
+        yield "prescreen", {"keyClauses": findings["keyClauses"], "redFlags": findings["redFlags"]}
+
+        if len(document_text) > LONG_DOCUMENT_CHARS:
+            # Map-reduce results only exist once every chunk is merged. "fast" was
+            # handled above, so this is the full analysis whatever ANALYSIS_MODE says
+            result = self.analyze_document(document_text, use_cache=False, mode="full")
+            if "error" in result:
+                yield "error", result["error"]
+                return
+            for section in ANALYSIS_SECTIONS:
+                yield section, result.get(section)
+            yield "result", result
+            return
+
+        buffer = ""
+        done = set()
+        try:
+            response = generate_stream(self.model, self._analysis_prompt(document_text, findings), "analyze_call")
+            for chunk in response:
+                buffer += chunk.text
+                yield from completed_sections(buffer, ANALYSIS_SECTIONS, done)
+            result = parse_model_json(buffer, "analyze")
+        except json.JSONDecodeError:
+            print("Error: Failed to decode JSON from AI response.")
+            yield "error", "Could not parse the AI's analysis."
+            return
+        except Exception as e:
+            _raise_if_timed_out(e)
+            print(f"Error during analysis: {e}")
+            yield "error", "An error occurred during document analysis."
+            return
+
+        # Sections the incremental parser could not pick out are sent from the full result
+        for section in ANALYSIS_SECTIONS:
+            if section not in done:
+                yield section, result.get(section)
+        if RESULT_CACHE_ENABLED:
+            result_cache.set_json(cache_key, result)
+        yield "result", result
+
+    def _analyze_long_document(self, document_text: str) -> dict:
+        """
+        Map-reduce analysis: each clause-aligned chunk is analyzed in parallel,
+        key clauses and red flags are merged and deduplicated, and the chunk
+        summaries are condensed into one summary. A chunk that fails is skipped,
+        but once the deadline has passed the whole analysis stops.
+        """
+        chunks = group_clauses(split_clauses(document_text), ANALYSIS_CHUNK_CHARS)
+        print(f"Long document ({len(document_text)} chars): analyzing {len(chunks)} chunks")
+
+        def analyze_chunk(index):
+            prompt = self._chunk_analysis_prompt(chunks[index], index + 1, len(chunks))
+            response = generate(self.model, prompt, "analyze_chunk_call")
+            return parse_model_json(response.text, "analyze_chunk")
+
+        partials = [None] * len(chunks)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=ANALYSIS_PARALLELISM) as executor:
+            futures = {executor.submit(traced(analyze_chunk), index): index for index in range(len(chunks))}
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    partials[index] = future.result()
+                except DeadlineExceeded:
+                    # Out of time or cancelled: the remaining chunks are stopping too
+                    raise
+                except Exception as e:
+                    print(f"Error analyzing chunk {index + 1} of {len(chunks)}: {e}")
+
+        partials = [partial for partial in partials if isinstance(partial, dict)]
+        if not partials:
+            return {"error": "An error occurred during document analysis."}
+
+        part_summaries = [partial.get("summary", "") for partial in partials if partial.get("summary")]
+        return {
+            "summary": self._combine_summaries(part_summaries),
+            "keyClauses": merge_findings([partial.get("keyClauses") for partial in partials])[:MAX_MERGED_KEY_CLAUSES],
+            "redFlags": merge_findings([partial.get("redFlags") for partial in partials]),
+        }
+
+    def _combine_summaries(self, part_summaries: list) -> str:
+        """
+        Condenses the per-chunk summaries into one; falls back to joining them.
+        """
+        if len(part_summaries) <= 1:
+            return part_summaries[0] if part_summaries else ""
+        parts = "\n".join(f"- {summary}" for summary in part_summaries)
         prompt = f"""
         **Instruction:**
+        You are an expert legal assistant named "Saral Kanoon" for an Indian audience. Below are summaries of consecutive parts of one legal document.
+        Write a single concise, easy-to-understand summary of the whole document's main purpose in plain and simple English without using uncommon english words.
+        Return only the summary text.
+
+        **Part Summaries:**
+        ---
+        {parts}
+        ---
+
+        **Summary:**
+        """
+        try:
+            return generate(self.model, prompt, "summary_merge_call").text.strip()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"Error combining summaries: {e}")
+            return " ".join(part_summaries)
+
+    def _chunk_analysis_prompt(self, chunk_text: str, part: int, total_parts: int) -> str:
+        return f"""
+        **Instruction:**
+        You are an expert legal assistant named "Saral Kanoon" for an Indian audience. You are given part {part} of {total_parts} of a long legal document. Analyze only this part and return a valid JSON object.
+        The JSON object must have three keys: "summary", "keyClauses", and "redFlags".
+
+        1.  **summary**: One or two plain, simple English sentences on what this part covers.
+        2.  **keyClauses**: An array of objects for the most important clauses in this part (at most 5). Each object must have a "title" and a "detail" explaining its impact on the user.
+        3.  **redFlags**: An array of objects identifying clauses in this part that are risky, unfair, or unusual. Each object must have a "title" and a "detail" explaining the potential risk. If there are no red flags, return an empty array.
+
+        {self._hints_section(chunk_text)}
+        **Document Part {part} of {total_parts}:**
+        ---
+        {chunk_text}
+        ---
+
+        **JSON Response:**
+        """
+
+    def _analysis_cache_key(self, document_text: str) -> str:
+        # The hints are part of the prompt, so the rules version is part of the key
+        version = f"{ANALYSIS_PROMPT_VERSION}+rules{RULES_VERSION}" if CLAUSE_RULE_HINTS else ANALYSIS_PROMPT_VERSION
+        return f"analyze:{version}:{self.model_name}:{sha256_hex(normalize_text(document_text))}"
+
+    def _hints_section(self, document_text: str, findings: dict = None) -> str:
+        """
+        The rule pre-screen's findings as a prompt section, or "" when hints are off or nothing was found.
+        """
+        if not CLAUSE_RULE_HINTS:
+            return ""
+        hints = prescreen_hints(findings if findings is not None else prescreen(document_text))
+        if not hints:
+            return ""
+        return f"""**Pre-screen Findings (rule-based, may be incomplete or wrong):**
+        An automatic check matched these clauses. Verify each against the text: use the ones that are correct, rewrite or drop the ones that are not, and add everything it missed.
+        {hints}
+
+        """
+
+    def _analysis_prompt(self, document_text: str, findings: dict = None) -> str:
+        return f"""
+        **Instruction:**
         You are an expert legal assistant named "Saral Kanoon" for an Indian audience. Your task is to analyze the provided legal document text and return a valid JSON object.
         The JSON object must have three keys: "summary", "keyClauses", and "redFlags".
 
@@ -74,6 +572,7 @@ class GeminiClient:
         2.  **keyClauses**: An array of objects, where each object represents one of the 3-5 most important clauses. Each object must have a "title" and a "detail" explaining its impact on the user.
         3.  **redFlags**: An array of objects identifying clauses that are risky, unfair, or unusual. Each object must have a "title" and a "detail" explaining the potential risk. If there are no red flags, return an empty array.
 
+        {self._hints_section(document_text, findings)}
         **Document Text to Analyze:**
         ---
         {document_text}
@@ -81,29 +580,52 @@ class GeminiClient:
 
         **JSON Response:**
         """
+
+    def answer_question(self, document_text: str, user_question: str, passages=None) -> str:
+        """
+        Answers a user's question based ONLY on the provided document context.
+        If passages (the excerpts retrieved for this question) are given, only
+        those are sent instead of the full document text.
+        """
+        prompt = self._question_prompt(document_text, user_question, passages)
         try:
-            response = self.model.generate_content(prompt)
-            cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_response)
-        except json.JSONDecodeError:
-            print("Error: Failed to decode JSON from AI response.")
-            return {"error": "Could not parse the AI's analysis."}
+            response = generate(self.model, prompt, "ask_call")
+            return response.text.strip()
         except Exception as e:
-            print(f"Error during analysis: {e}")
-            return {"error": "An error occurred during document analysis."}
+            _raise_if_timed_out(e)
+            print(f"Error during Q&A: {e}")
+            return "Sorry, an error occurred while answering your question."
 
-    def answer_question(self, document_text: str, user_question: str) -> str:
+    def answer_question_stream(self, document_text: str, user_question: str, passages=None):
         """
-        Answers a user's question based ONLY on the provided document context.
+        Streaming version of answer_question that yields the answer text as it is generated.
         """
-        prompt = f"""
+        prompt = self._question_prompt(document_text, user_question, passages)
+        try:
+            for chunk in generate_stream(self.model, prompt, "ask_call"):
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            _raise_if_timed_out(e)
+            print(f"Error during Q&A: {e}")
+            yield "Sorry, an error occurred while answering your question."
+
+    def _question_prompt(self, document_text: str, user_question: str, passages=None) -> str:
+        if passages:
+            context_label = "Relevant Excerpts From The Document"
+            context = "\n...\n".join(passages)
+        else:
+            context_label = "Document Text"
+            context = document_text
+
+        return f"""
         **Instruction:**
         You are a Q&A assistant for "Saral Kanoon". Answer the user's question in simplest english possible based *ONLY* on the provided document text.
         Do not use any external knowledge. If the answer is not in the document, you MUST state: "The answer to that question could not be found in the provided document."
 
-        **Document Text:**
+        **{context_label}:**
         ---
-        {document_text}
+        {context}
         ---
 
         **User's Question:**
@@ -111,21 +633,40 @@ class GeminiClient:
 
         **Answer:**
         """
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Error during Q&A: {e}")
-            return "Sorry, an error occurred while answering your question."
     
-    def compare_documents(self, old_doc_text: str, new_doc_text: str) -> dict:
+    def compare_documents(self, old_doc_text: str, new_doc_text: str, use_cache: bool = True) -> dict:
         """
         Compares two legal documents and highlights the differences and risks.
+
+        A local clause diff runs first and only the added, removed and modified
+        clauses are sent to the model; unchanged clauses are listed in
+        "unchangedClauses" at no cost. Results are cached by both document
+        hashes, prompt version and model unless use_cache is False.
         """
+        cache_key = (
+            f"compare:{COMPARE_PROMPT_VERSION}:{self.model_name}:"
+            f"{sha256_hex(normalize_text(old_doc_text))}:{sha256_hex(normalize_text(new_doc_text))}"
+        )
+        if use_cache and RESULT_CACHE_ENABLED:
+            cached = result_cache.get_json(cache_key)
+            if cached is not None:
+                return cached
+
+        diff = diff_documents(old_doc_text, new_doc_text)
+        unchanged = [entry["title"] for entry in diff["unchanged"]]
+        if not has_changes(diff):
+            return {
+                "overallRiskAssessment": {"rating": "No Changes", "summary": "Both documents contain the same clauses."},
+                "newClauses": [],
+                "removedClauses": [],
+                "modifiedClauses": [],
+                "unchangedClauses": unchanged,
+            }
+
         prompt = f"""
         **Instruction:**
         You are an expert legal assistant, "Saral Kanoon", specializing in contract comparison for an Indian audience.
-        Analyze the "Old Document" and the "New Document" provided below. Your goal is to identify all significant differences and assess the risk of these changes for the person signing the new contract.
+        Below are the clauses that differ between an "Old Document" and a "New Document", already matched up for you; every other clause is identical in both. Your goal is to assess the risk of these changes for the person signing the new contract.
 
         Your response MUST be a valid JSON object with four keys: "overallRiskAssessment", "newClauses", "removedClauses", and "modifiedClauses".
 
@@ -138,31 +679,47 @@ class GeminiClient:
             - "newTextSummary": A brief summary of the clause in the New Document.
             - "riskAnalysis": A clear explanation of the change's impact and any new risks involved.
 
-        **Old Document Text:**
+        **Changed Clauses:**
         ---
-        {old_doc_text}
+        {format_changes(diff)}
         ---
 
-        **New Document Text:**
-        ---
-        {new_doc_text}
-        ---
+        **Unchanged Clauses (for context only):** {", ".join(unchanged) or "None"}
 
         **JSON Response:**
         """
         try:
-            response = self.model.generate_content(prompt)
-            cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_response)
+            response = generate(self.model, prompt, "compare_call")
+            result = parse_model_json(response.text, "compare")
+            result["unchangedClauses"] = unchanged
+            if RESULT_CACHE_ENABLED:
+                result_cache.set_json(cache_key, result)
+            return result
         except Exception as e:
+            _raise_if_timed_out(e)
             print(f"Error during document comparison: {e}")
             return {"error": "An error occurred during document comparison."}
 
 # --- Translation Utility ---
+# Translations are cached on disk by (segment hash, target language), so a
+# clause that has been translated once is never sent to the model again.
+translation_cache = DiskCache("translations", int(os.getenv("TRANSLATION_CACHE_MAX_MB", "64")) * 1024 * 1024)
+# Segments are packed into model calls of at most this many characters / segments
+TRANSLATION_BATCH_CHARS = int(os.getenv("TRANSLATION_BATCH_CHARS", "6000"))
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "40"))
+TRANSLATION_PARALLELISM = int(os.getenv("TRANSLATION_PARALLELISM", "4"))
+
+def _translation_key(text: str, target_lang: str) -> str:
+    return f"{target_lang}:{sha256_hex(text)}"
+
 def translate_text(text: str, target_lang: str) -> str:
     """
     Translate text to the target language using Gemini API.
     """
+    cached = translation_cache.get(_translation_key(text, target_lang))
+    if cached is not None:
+        return cached.decode("utf-8")
+
     # For demo: Use Gemini for translation, fallback to English if not supported
     prompt = f"""
     Translate the following text to {target_lang}:
@@ -172,31 +729,99 @@ def translate_text(text: str, target_lang: str) -> str:
     Only return the translated text, no explanation.
     """
     try:
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        model = get_model(DEFAULT_MODEL)
+        response = generate(model, prompt, "translate_call")
+        translated = response.text.strip()
+        translation_cache.set(_translation_key(text, target_lang), translated.encode("utf-8"))
+        return translated
     except Exception as e:
         print(f"Translation error: {e}")
         return text
 
-# --- Text-to-Speech Utility ---
-def text_to_speech(text: str, lang: str) -> bytes:
+def _translate_packed(segments: list, target_lang: str) -> list:
     """
-    Convert text to speech audio using gTTS.
-    Returns audio bytes (mp3).
+    Translates several segments in one model call using a JSON array in and out.
+    Returns the translations in order; None marks a segment the model left out.
     """
-    try:
-        tts = gTTS(text=text, lang=lang)
-        from io import BytesIO
-        audio_fp = BytesIO()
-        tts.write_to_fp(audio_fp)
-        audio_fp.seek(0)
-        return audio_fp.read()
-    except Exception as e:
-        print(f"TTS error: {e}")
-        return b''
+    payload = json.dumps([{"id": index, "text": text} for index, text in enumerate(segments)], ensure_ascii=False)
+    prompt = f"""
+    Translate the "text" of every item in the following JSON array to {target_lang}.
+    Return ONLY a JSON array with one object per input item, in the same order, each with the same "id" and the translated "text".
+    Do not merge, split, skip or explain items.
+    ---
+    {payload}
+    ---
+    """
+    response = generate(get_model(DEFAULT_MODEL), prompt, "translate_call")
+    translated = [None] * len(segments)
+    for item in parse_model_json(response.text, "translate"):
+        index = item.get("id") if isinstance(item, dict) else None
+        if isinstance(index, int) and 0 <= index < len(segments) and isinstance(item.get("text"), str):
+            translated[index] = item["text"].strip()
+    return translated
+
+def _pack_segments(segments: list) -> list:
+    """
+    Groups segments into batches bounded by TRANSLATION_BATCH_CHARS and TRANSLATION_BATCH_SIZE.
+    """
+    batches = []
+    current = []
+    size = 0
+    for segment in segments:
+        if current and (size + len(segment) > TRANSLATION_BATCH_CHARS or len(current) >= TRANSLATION_BATCH_SIZE):
+            batches.append(current)
+            current, size = [], 0
+        current.append(segment)
+        size += len(segment)
+    if current:
+        batches.append(current)
+    return batches
+
+def translate_batch(segments: list, target_langs: list) -> dict:
+    """
+    Translates many segments into one or more languages with as few model calls as possible.
+
+    Identical segments are translated once, cached translations are reused,
+    and the rest are packed into JSON batches that run concurrently. Segments
+    a batch leaves out fall back to translate_text one at a time.
+
+    Returns:
+        {target_lang: [translation for each input segment, in order]}
+    """
+    unique = list(dict.fromkeys(segment for segment in segments if segment and segment.strip()))
+    translations = {lang: {} for lang in target_langs}
+
+    pending = []
+    for lang in target_langs:
+        missing = []
+        for segment in unique:
+            cached = translation_cache.get(_translation_key(segment, lang))
+            if cached is not None:
+                translations[lang][segment] = cached.decode("utf-8")
+            else:
+                missing.append(segment)
+        pending.extend((lang, batch) for batch in _pack_segments(missing))
+
+    def run(lang, batch):
+        try:
+            results = _translate_packed(batch, lang)
+        except Exception as e:
+            print(f"Batch translation error ({lang}, {len(batch)} segments): {e}")
+            results = [None] * len(batch)
+        for segment, translated in zip(batch, results):
+            if translated is None:
+                translated = translate_text(segment, lang)
+            else:
+                translation_cache.set(_translation_key(segment, lang), translated.encode("utf-8"))
+            translations[lang][segment] = translated
+
+    if pending:
+        print(f"Translating {sum(len(batch) for _, batch in pending)} segments in {len(pending)} batches")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=TRANSLATION_PARALLELISM) as executor:
+            for future in [executor.submit(traced(run), lang, batch) for lang, batch in pending]:
+                future.result()
+
+    return {lang: [translations[lang].get(segment, segment) for segment in segments] for lang in target_langs}
 
 # --- Example Usage (for testing this file directly) ---
 if __name__ == '__main__':
@@ -0,0 +1,228 @@
+# backend/utils/cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import json
+from collections import OrderedDict
+from .metrics import inc
+
+# All caches live in one SQLite file so every gunicorn worker on the box shares them.
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "saralkanoon-cache"))
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "cache.sqlite3")
+
+def sha256_hex(data) -> str:
+    """
+    Hex SHA-256 of bytes or text, used for content-addressed cache keys.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+class DiskCache:
+    """
+    A small size-bounded LRU key/value store on top of SQLite.
+
+    Entries are grouped by namespace, and each namespace is evicted
+    least-recently-used first once it grows past max_bytes. SQLite's WAL mode
+    lets several processes read and write the same file, so forked gunicorn
+    workers can share one cache. Connections are opened per process and
+    thread, which keeps the object safe to create before a fork.
+
+    With memory_max_bytes set, recently used entries are also kept in a
+    per-process LRU in front of SQLite.
+    """
+    def __init__(self, namespace: str, max_bytes: int, ttl_seconds=None, path=None, memory_max_bytes=0):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path = path or CACHE_DB_PATH
+        self.memory_max_bytes = memory_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._memory_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Reads go through a shared memory map of the file instead of copying pages per connection
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL,
+                expires REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (namespace, accessed)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        inc("saralkanoon_cache_lookups_total", cache=self.namespace, result="hit" if hit else "miss")
+
+    def get(self, key: str):
+        """
+        Returns the stored bytes for key, or None on a miss or expired entry.
+        """
+        value = self._memory_get(key)
+        if value is not None:
+            self._count(True)
+            return value
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            now = time.time()
+            if row is None or (row[1] is not None and row[1] < now):
+                self._count(False)
+                return None
+            conn.execute(
+                "UPDATE cache_entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._count(True)
+            value = bytes(row[0])
+            self._memory_set(key, value, row[1])
+            return value
+        except sqlite3.Error as e:
+            # A broken cache must never break a request
+            print(f"Cache read error ({self.namespace}): {e}")
+            self._count(False)
+            return None
+
+    def set(self, key: str, value: bytes, ttl_seconds=None) -> bool:
+        """
+        Stores value under key and evicts least-recently-used entries if the namespace is over budget.
+
+        Returns:
+            False if the value was not stored: larger than max_bytes, or a database error.
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        now = time.time()
+        expires = now + ttl if ttl else None
+        if len(value) > self.max_bytes:
+            return False
+        self._memory_set(key, value, expires)
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, accessed, expires) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, sqlite3.Binary(value), len(value), now, expires),
+            )
+            self._evict(conn, now)
+            return True
+        except sqlite3.Error as e:
+            print(f"Cache write error ({self.namespace}): {e}")
+            return False
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value, ttl_seconds=None) -> bool:
+        return self.set(key, json.dumps(value).encode("utf-8"), ttl_seconds)
+
+    def delete(self, key: str):
+        with self._memory_lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key)[0])
+        try:
+            self._connect().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            print(f"Cache delete error ({self.namespace}): {e}")
+
+    def _memory_get(self, key: str):
+        if not self.memory_max_bytes:
+            return None
+        with self._memory_lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._memory[key]
+                self._memory_bytes -= len(value)
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: bytes, expires):
+        if not self.memory_max_bytes or len(value) > self.memory_max_bytes:
+            return
+        with self._memory_lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key)[0])
+            self._memory[key] = (value, expires)
+            self._memory_bytes += len(value)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (old_value, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old_value)
+
+    def _evict(self, conn, now):
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires IS NOT NULL AND expires < ?",
+            (self.namespace, now),
+        )
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from the oldest access until enough bytes have been freed
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed", (self.namespace,)
+        ):
+            stale.append((self.namespace, key))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", stale)
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters for this process plus the shared entry count and size.
+        """
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+            "memoryBytes": self._memory_bytes,
+        }
@@ -0,0 +1,342 @@
+# backend/utils/clause_rules.py
+
+import re
+from .clauses import split_clauses
+from .metrics import stage
+
+# --- Clause Rule Library ---
+# A local pre-screen for the clauses that come up in almost every Indian rental
+# agreement (rent, deposit, lock-in, notice, escalation, late fees, landlord
+# access...). Each rule names the words a clause must contain and the patterns
+# that pick out the details. The patterns are compiled once at import and
+# indexed by keyword, so a clause is only matched against the rules whose
+# keywords it contains. The findings are shown before the model answers, sent
+# to the model as hints, and are the whole analysis in "fast" mode.
+# Bump RULES_VERSION when the rules change: it is part of the analysis cache key.
+RULES_VERSION = "4"
+
+# Monthly rent multiples above which a residential deposit is flagged (the Model Tenancy Act caps it at two)
+MAX_DEPOSIT_MONTHS = 2
+MAX_ANNUAL_ESCALATION_PERCENT = 10
+MAX_MONTHLY_INTEREST_PERCENT = 2
+MIN_ENTRY_NOTICE_HOURS = 24
+MAX_REFUND_DAYS = 30
+EXCERPT_CHARS = 240
+
+# "Rs" and "INR" must start a word: "hours 15" is not an amount
+AMOUNT = r"(?:₹|\b(?:rs\.?|inr))\s*(?P<amount>\d[\d,]*(?:\.\d+)?)"
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "thirty": 30, "sixty": 60, "ninety": 90,
+}
+# "6 months", "one month", "30 (thirty) days", "4 hours"
+PERIOD = (
+    r"(?P<count>\d+|" + "|".join(NUMBER_WORDS) + r")\s*(?:\([a-z\s-]+\)\s*)?"
+    r"(?P<unit>hour|day|week|month|year)s?\b"
+)
+UNIT_DAYS = {"hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+ENTRY_NOTICE = (
+    re.compile(r"\bnotice\s+of\s+" + PERIOD, re.IGNORECASE),
+    re.compile(PERIOD + r"(?:'s|s')?\s+(?:prior\s+|advance\s+|written\s+)*notice", re.IGNORECASE),
+)
+WORD = re.compile(r"[a-z]+")
+# What a pattern may skip between two words of the same sentence. Bounded, so a
+# long run of text without a full stop (a bad OCR page, a table) cannot make a
+# pattern with several gaps backtrack for seconds.
+GAP = r"[^.]{0,200}"
+# A gap that also stops short of the words of other money terms, so the rent
+# rule takes the amount nearest to "rent", not the deposit or late fee after it
+RENT_GAP = r"(?:(?!\b(?:late|deposit|increase|escalat))[^.]){0,200}?"
+
+def _amount(match) -> float:
+    return float(match.group("amount").replace(",", ""))
+
+def _days(match) -> float:
+    count = match.group("count").lower()
+    count = NUMBER_WORDS.get(count) or int(count)
+    return count * UNIT_DAYS[match.group("unit").lower()]
+
+def _period(match) -> str:
+    count = match.group("count").lower()
+    count = NUMBER_WORDS.get(count) or int(count)
+    unit = match.group("unit").lower()
+    return f"{count} {unit}{'s' if count != 1 else ''}"
+
+def _rupees(value: float) -> str:
+    # Indian digit grouping: 1,50,000
+    whole = str(int(round(value)))
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return "₹" + ",".join(([head] if head else []) + groups + [tail])
+
+# --- Rule Details ---
+# Each takes (match, facts) and returns the finding's detail, or None when the
+# clause is fine after all (e.g. a deposit within limits).
+
+def _rent_detail(match, facts):
+    due = re.search(r"\b(?:on or before|by|before)\s+the\s+(\d+(?:st|nd|rd|th))\b", match.string[match.start():], re.IGNORECASE)
+    due_text = f", due by the {due.group(1)} of each month" if due else ""
+    return f"You pay {_rupees(_amount(match))} as rent every month{due_text}."
+
+def _deposit_detail(match, facts):
+    return f"You pay a security deposit of {_rupees(_amount(match))}, which is returned at the end minus any valid deductions."
+
+def _high_deposit_detail(match, facts):
+    deposit, rent = facts.get("deposit"), facts.get("rent")
+    if not deposit or not rent or deposit <= MAX_DEPOSIT_MONTHS * rent:
+        return None
+    return (f"The deposit of {_rupees(deposit)} is {deposit / rent:.0f} months' rent. The Model Tenancy Act "
+            f"limits residential deposits to {MAX_DEPOSIT_MONTHS} months' rent; a larger deposit is more money at risk.")
+
+def _forfeit_detail(match, facts):
+    deposit = f" of {_rupees(facts['deposit'])}" if facts.get("deposit") else ""
+    return f"You can lose your entire security deposit{deposit}, for example by leaving before an agreed date."
+
+def _lock_in_detail(match, facts):
+    return f"You cannot move out during the first {_period(match)} without a penalty."
+
+def _term_detail(match, facts):
+    return f"The agreement lasts {_period(match)}; renewal needs a new agreement or the terms it sets out."
+
+def _notice_detail(match, facts):
+    if match.group("unit").lower() == "hour":
+        return None
+    return f"Ending the agreement needs {_period(match)} of notice."
+
+def _entry_detail(match, facts):
+    clause = match.string
+    if re.search(r"without\s+(?:any\s+)?(?:prior\s+)?notice", clause, re.IGNORECASE) and not re.search(r"emergenc", clause, re.IGNORECASE):
+        return "The landlord may enter your home without any notice."
+    notice = ENTRY_NOTICE[0].search(clause) or ENTRY_NOTICE[1].search(clause)
+    if notice:
+        if _days(notice) * 24 < MIN_ENTRY_NOTICE_HOURS:
+            return f"The landlord may enter your home with only {_period(notice)} notice; at least {MIN_ENTRY_NOTICE_HOURS} hours is usual."
+        return None
+    if re.search(r"\bat any time\b", clause, re.IGNORECASE):
+        return "The landlord may enter your home at any time."
+    return None
+
+def _late_fee_detail(match, facts):
+    fee = _amount(match)
+    rent = facts.get("rent")
+    monthly = f", which is {fee * 30 / rent:.0%} of the rent if you are a month late" if rent else ""
+    return f"Late rent costs {_rupees(fee)} for every day it is late{monthly}."
+
+def _interest_detail(match, facts):
+    percent = float(match.group("percent"))
+    per_month = percent if match.group("per").lower() == "month" else percent / 12
+    if per_month <= MAX_MONTHLY_INTEREST_PERCENT:
+        return None
+    return f"Late payments carry interest of {percent:g}% per {match.group('per').lower()}, which is steep."
+
+def _escalation_detail(match, facts):
+    return f"The rent goes up by {float(match.group('percent')):g}% at each increase."
+
+def _high_escalation_detail(match, facts):
+    percent = float(match.group("percent"))
+    if percent <= MAX_ANNUAL_ESCALATION_PERCENT:
+        return None
+    return f"A {percent:g}% rent increase is above the usual {MAX_ANNUAL_ESCALATION_PERCENT}% or less per year."
+
+def _refund_detail(match, facts):
+    if _days(match) <= MAX_REFUND_DAYS:
+        return None
+    return f"The deposit is only refunded within {_period(match)} of moving out; one month or less is usual."
+
+def _fixed(detail):
+    return lambda match, facts: detail
+
+# Rules: id, section ("keyClauses" or "redFlags"), title, keywords (any one must
+# appear in the clause as a word), patterns (the first that matches decides) and detail.
+RULES = (
+    {"id": "rent", "section": "keyClauses", "title": "Monthly Rent", "keywords": ("rent",),
+     "patterns": (r"\b(?:monthly\s+)?rent\b" + RENT_GAP + AMOUNT,),
+     "detail": _rent_detail},
+    {"id": "security_deposit", "section": "keyClauses", "title": "Security Deposit", "keywords": ("deposit",),
+     "patterns": (r"\bdeposit\b" + GAP + "?" + AMOUNT,), "detail": _deposit_detail},
+    {"id": "term", "section": "keyClauses", "title": "Agreement Term", "keywords": ("term", "period", "lease", "licence", "license"),
+     "patterns": (r"\b(?:term|period)\s+of\s+(?:this\s+)?(?:lease|agreement|licen[cs]e)\s+(?:is|shall be)\s+(?:for\s+)?(?:a\s+period\s+of\s+)?" + PERIOD,
+                  r"\b(?:lease|agreement|licen[cs]e)\s+(?:is|shall be)\s+(?:valid\s+)?for\s+(?:a\s+period\s+of\s+)?" + PERIOD),
+     "detail": _term_detail},
+    {"id": "lock_in", "section": "keyClauses", "title": "Lock-in Period", "keywords": ("lock",),
+     "patterns": (r"\block[\s-]*in\s+period\s+(?:is\s+|of\s+|shall be\s+)*" + PERIOD,), "detail": _lock_in_detail},
+    {"id": "notice_period", "section": "keyClauses", "title": "Notice Period", "keywords": ("notice",),
+     "patterns": (r"\bnotice\s+(?:period\s+)?of\s+" + PERIOD, PERIOD + r"(?:'s|s')?\s+(?:prior\s+|written\s+|advance\s+)*notice"),
+     "detail": _notice_detail},
+    {"id": "rent_escalation", "section": "keyClauses", "title": "Rent Increase", "keywords": ("increase", "increased", "escalation", "enhanced", "enhancement", "revised", "hike"),
+     "patterns": (r"\b(?:increase|escalat|enhance|revis|hike)\w*\b" + GAP + "?" + r"(?P<percent>\d+(?:\.\d+)?)\s*(?:%|per\s*cent)",),
+     "detail": _escalation_detail},
+    {"id": "deposit_forfeiture", "section": "redFlags", "title": "Security Deposit Can Be Forfeited", "keywords": ("forfeit", "forfeited", "forfeiture"),
+     "patterns": (r"\bdeposit\b" + GAP + r"\bforfeit", r"\bforfeit\w*\b" + GAP + r"\bdeposit\b"), "detail": _forfeit_detail},
+    {"id": "high_deposit", "section": "redFlags", "title": "Security Deposit Above Two Months' Rent", "keywords": ("deposit",),
+     "patterns": (r"\bdeposit\b" + GAP + "?" + AMOUNT,), "detail": _high_deposit_detail},
+    {"id": "daily_late_fee", "section": "redFlags", "title": "Daily Late Fee", "keywords": ("late", "delay", "delayed"),
+     "patterns": (r"\b(?:late|delay\w*)\b" + GAP + "?" + AMOUNT + r"\s*(?:/-\s*)?(?:per|a|each|for every)\s+day\b",), "detail": _late_fee_detail},
+    {"id": "high_interest", "section": "redFlags", "title": "High Interest on Late Payment", "keywords": ("interest",),
+     "patterns": (r"\binterest\b" + GAP + "?" + r"(?P<percent>\d+(?:\.\d+)?)\s*%\s*(?:per|a|p\.?)\s*(?P<per>month|annum|year)",), "detail": _interest_detail},
+    {"id": "steep_escalation", "section": "redFlags", "title": "Steep Rent Increase", "keywords": ("increase", "increased", "escalation", "enhanced", "enhancement", "revised", "hike"),
+     "patterns": (r"\b(?:increase|escalat|enhance|revis|hike)\w*\b" + GAP + "?" + r"(?P<percent>\d+(?:\.\d+)?)\s*(?:%|per\s*cent)",),
+     "detail": _high_escalation_detail},
+    {"id": "landlord_entry", "section": "redFlags", "title": "Landlord Can Enter With Little Notice", "keywords": ("enter", "entry", "inspect", "inspection", "access"),
+     "patterns": (r"\b(?:landlord|lessor|licensor|owner)\b" + GAP + r"\b(?:enter|entry|inspect|access)\w*\b",), "detail": _entry_detail},
+    {"id": "one_sided_termination", "section": "redFlags", "title": "Landlord Can End the Agreement at Will", "keywords": ("terminate", "termination", "evict", "vacate"),
+     "patterns": (r"\b(?:landlord|lessor|licensor|owner)\b" + GAP + r"\b(?:terminate|evict|vacate)\w*\b" + GAP + r"\b(?:at any time|without (?:any )?(?:prior )?notice|sole discretion|without assigning any reason)",),
+     "detail": _fixed("The landlord can end the agreement or ask you to leave without notice or reason.")},
+    {"id": "non_refundable", "section": "redFlags", "title": "Non-Refundable Payment", "keywords": ("non", "nonrefundable"),
+     "patterns": (r"\bnon[\s-]*refundable\b",), "detail": _fixed("Part of what you pay will not be returned, whatever happens.")},
+    {"id": "fixed_deductions", "section": "redFlags", "title": "Fixed Deductions From the Deposit", "keywords": ("painting", "whitewash", "whitewashing", "cleaning"),
+     "patterns": (r"\b(?:painting|whitewash\w*|cleaning)\b" + GAP + r"\b(?:deduct\w*|deposit)\b", r"\bdeduct\w*\b" + GAP + r"\b(?:painting|whitewash\w*|cleaning)\b"),
+     "detail": _fixed("Painting or cleaning charges are taken from your deposit regardless of the flat's condition.")},
+    {"id": "slow_refund", "section": "redFlags", "title": "Slow Deposit Refund", "keywords": ("refund", "refunded", "returned", "repaid"),
+     "patterns": (r"\b(?:refund|return|repa)\w*\b" + GAP + "?" + r"\bwithin\s+" + PERIOD,), "detail": _refund_detail},
+    {"id": "tenant_major_repairs", "section": "redFlags", "title": "Tenant Pays for Major Repairs", "keywords": ("repairs", "repair"),
+     "patterns": (r"\b(?:tenant|lessee|licensee)\b" + GAP + r"\b(?:responsible for|bear|pay for)\b" + GAP + r"\b(?:all|major|structural)\s+repairs\b",),
+     "detail": _fixed("You would pay for major or structural repairs, which are normally the landlord's responsibility.")},
+)
+
+def _compile(rules) -> tuple:
+    compiled = []
+    index = {}
+    for position, rule in enumerate(rules):
+        compiled.append(dict(rule, patterns=tuple(re.compile(pattern, re.IGNORECASE) for pattern in rule["patterns"])))
+        for keyword in rule["keywords"]:
+            index.setdefault(keyword, []).append(position)
+    return tuple(compiled), index
+
+_COMPILED_RULES, _KEYWORD_INDEX = _compile(RULES)
+
+def _candidate_rules(clause_text: str) -> list:
+    """
+    The rules whose keywords occur in the clause, in library order.
+    """
+    positions = set()
+    for word in set(WORD.findall(clause_text.lower())):
+        positions.update(_KEYWORD_INDEX.get(word, ()))
+    return [_COMPILED_RULES[position] for position in sorted(positions)]
+
+def _excerpt(match) -> str:
+    # The sentence the match is in, trimmed
+    text = match.string
+    start = text.rfind(". ", 0, match.start())
+    start = 0 if start == -1 else start + 2
+    end = text.find(". ", match.end())
+    end = len(text) if end == -1 else end + 1
+    sentence = text[start:end].strip()
+    return sentence if len(sentence) <= EXCERPT_CHARS else sentence[:EXCERPT_CHARS - 3].rstrip() + "..."
+
+def _document_facts(clauses: list) -> dict:
+    """
+    Monthly rent and deposit amounts, which rules compare against each other.
+    """
+    facts = {}
+    for clause in clauses:
+        for rule in _candidate_rules(clause["text"]):
+            if rule["id"] not in ("rent", "security_deposit"):
+                continue
+            fact = "rent" if rule["id"] == "rent" else "deposit"
+            if fact in facts:
+                continue
+            for pattern in rule["patterns"]:
+                match = pattern.search(clause["text"])
+                if match:
+                    facts[fact] = _amount(match)
+                    break
+    return facts
+
+def prescreen(text: str, clauses: list = None) -> dict:
+    """
+    Runs the rule library over a document. Takes milliseconds and never calls the model.
+
+    Args:
+        text: The document text.
+        clauses: Its split_clauses() result, if already computed.
+
+    Returns:
+        {"keyClauses": [...], "redFlags": [...], "facts": {"rent", "deposit"}} where each
+        finding is {"title", "detail", "rule", "clause", "excerpt"}; every rule reports
+        at most once, from the first clause it matches.
+    """
+    with stage("prescreen", chars_in=len(text)) as span:
+        clauses = clauses if clauses is not None else split_clauses(text)
+        facts = _document_facts(clauses)
+        findings = {"keyClauses": [], "redFlags": []}
+        reported = set()
+        for clause in clauses:
+            for rule in _candidate_rules(clause["text"]):
+                if rule["id"] in reported:
+                    continue
+                for pattern in rule["patterns"]:
+                    match = pattern.search(clause["text"])
+                    if not match:
+                        continue
+                    detail = rule["detail"](match, facts)
+                    if detail:
+                        reported.add(rule["id"])
+                        findings[rule["section"]].append({
+                            "title": rule["title"],
+                            "detail": detail,
+                            "rule": rule["id"],
+                            "clause": clause["title"],
+                            "excerpt": _excerpt(match),
+                        })
+                    break
+        span.update(clauses=len(clauses), key_clauses=len(findings["keyClauses"]), red_flags=len(findings["redFlags"]))
+        return {**findings, "facts": facts}
+
+def prescreen_hints(findings: dict) -> str:
+    """
+    Formats pre-screen findings as a prompt section, or "" when there are none.
+    """
+    lines = []
+    for section, label in (("keyClauses", "Key clause"), ("redFlags", "Possible red flag")):
+        for finding in findings.get(section, []):
+            lines.append(f'- {label}: {finding["title"]}. {finding["detail"]} (Text: "{finding["excerpt"]}")')
+    if not lines:
+        return ""
+    return "\n".join(lines)
+
+def fast_analysis(text: str) -> dict:
+    """
+    An analysis built from the rule library alone, in the shape of the model's
+    ({"summary", "keyClauses", "redFlags"}) with "analysisMode": "fast".
+    """
+    findings = prescreen(text)
+    facts = findings["facts"]
+    terms = []
+    if facts.get("rent"):
+        terms.append(f"rent of {_rupees(facts['rent'])} a month")
+    if facts.get("deposit"):
+        terms.append(f"a security deposit of {_rupees(facts['deposit'])}")
+    terms_text = f" It sets {' and '.join(terms)}." if terms else ""
+    flags = len(findings["redFlags"])
+    summary = (
+        f"Quick check of the common clauses in this agreement.{terms_text} "
+        f"{flags} possible red flag{'s' if flags != 1 else ''} found. "
+        "This check only looks for well-known clause types; run the full analysis for a complete review."
+    )
+    return {
+        "summary": summary,
+        "keyClauses": findings["keyClauses"],
+        "redFlags": findings["redFlags"],
+        "analysisMode": "fast",
+    }
+
+# --- Example Usage (for testing this file directly) ---
+# Run from backend/ as: python -m utils.clause_rules
+if __name__ == '__main__':
+    examples = (
+        # (text, expected facts)
+        ("The monthly rent is Rs. 15,000. The security deposit is Rs. 30,000.", {"rent": 15000.0, "deposit": 30000.0}),
+        ("The deposit shall be refunded within 48 hours 15 days of vacating, and the deposit is Rs. 20,000.", {"deposit": 20000.0}),
+        ("A deposit of INR 50,000 and rent of ₹ 12,500 are payable.", {"rent": 12500.0, "deposit": 50000.0}),
+        ("The monthly rent is ₹15,000 and the security deposit is ₹90,000.", {"rent": 15000.0, "deposit": 90000.0}),
+        ("Rent of Rs 12000 per month plus a deposit of Rs 24000", {"rent": 12000.0, "deposit": 24000.0}),
+        ("The rent of INR 25,000 per month is due on the 5th, and any late payment is charged Rs 500 per day.", {"rent": 25000.0}),
+    )
+    for text, expected in examples:
+        facts = prescreen(text)["facts"]
+        print(f"{'ok' if facts == expected else 'FAILED'}: {facts} from {text!r}")
+        assert facts == expected, f"expected {expected}"
@@ -0,0 +1,85 @@
+# backend/utils/clauses.py
+
+import re
+
+# A clause starts on a line like "5. RENT", "5.1 ...", "(a) ...", "iv) ...", "Clause 7 ..." or "Section 3 ..."
+CLAUSE_START = re.compile(
+    r"^\s*(?:(?:clause|section|article)\s+\d+[a-z]?\b|\d+(?:\.\d+)*[.)]|\([a-z0-9]{1,4}\)|[ivx]{1,5}[.)])\s+",
+    re.IGNORECASE,
+)
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+# Clauses longer than this are split into sentence-aligned chunks
+MAX_CLAUSE_CHARS = 1200
+
+def _split_long(text: str, max_chars: int) -> list:
+    """
+    Splits an over-long clause at sentence boundaries into pieces of at most max_chars.
+    """
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END.split(text):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+def group_clauses(clauses: list, max_chars: int) -> list:
+    """
+    Packs consecutive clauses into chunks of at most max_chars so that no clause is cut in half.
+
+    Returns:
+        A list of chunk texts in document order.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for clause in clauses:
+        if current and size + len(clause["text"]) > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(clause["text"])
+        size += len(clause["text"]) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def split_clauses(text: str, max_chars: int = MAX_CLAUSE_CHARS) -> list:
+    """
+    Segments document text into clauses using numbering and headings, falling
+    back to blank-line paragraphs for unnumbered documents.
+
+    Returns:
+        A list of {"id", "title", "text"} dicts in document order. "title" is
+        the clause's first line (e.g. "4. SECURITY DEPOSIT") and long clauses
+        are split into several entries sharing that title.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    numbered = sum(1 for line in lines if CLAUSE_START.match(line))
+
+    blocks = []
+    current = []
+    for line in lines:
+        if numbered >= 2:
+            starts_block = bool(CLAUSE_START.match(line))
+        else:
+            # Unnumbered text: paragraphs are separated by blank lines
+            starts_block = not line
+        if starts_block and current:
+            blocks.append(current)
+            current = []
+        if line:
+            current.append(line)
+    if current:
+        blocks.append(current)
+
+    clauses = []
+    for block in blocks:
+        title = block[0][:120]
+        body = " ".join(block)
+        for piece in _split_long(body, max_chars) if len(body) > max_chars else [body]:
+            clauses.append({"id": len(clauses), "title": title, "text": piece})
+    return clauses
@@ -0,0 +1,162 @@
+# backend/utils/compare.py
+
+import re
+import difflib
+from .clauses import CLAUSE_START, split_clauses
+from .deadlines import check_deadline
+
+# Clauses at least this similar are reported as "modified" rather than removed + added
+MODIFIED_SIMILARITY = 0.55
+# A removed clause is only compared with the added clauses at most this many
+# places away from it (in order of appearance), or with the same heading
+PAIR_WINDOW = 8
+# Share of distinct words two clauses must have in common before their text is compared
+MIN_WORD_OVERLAP = 0.4
+# Full text comparisons per diff, most promising pairs first; clauses left
+# unpaired are reported as added/removed
+MAX_PAIR_COMPARISONS = 300
+WORD = re.compile(r"\w+")
+
+def clause_key(clause: dict) -> str:
+    """
+    Comparison key of a clause: lower-cased, whitespace-collapsed and without
+    its leading number, so renumbered clauses still count as unchanged.
+    """
+    text = CLAUSE_START.sub("", clause["text"], count=1)
+    return " ".join(text.lower().split())
+
+def _title(clause: dict) -> str:
+    return CLAUSE_START.sub("", clause["title"], count=1).strip() or clause["title"]
+
+def _word_overlap(old_words: set, new_words: set) -> float:
+    # Jaccard similarity of the two clauses' word sets
+    if not old_words or not new_words:
+        return 0.0
+    return len(old_words & new_words) / len(old_words | new_words)
+
+def _similarity(old_key: str, new_key: str) -> float:
+    # Word by word: as telling as character by character for prose, and far cheaper
+    matcher = difflib.SequenceMatcher(None, old_key.split(), new_key.split(), autojunk=False)
+    # quick_ratio is an upper bound, so most unrelated pairs are rejected cheaply
+    if matcher.quick_ratio() < MODIFIED_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+def diff_documents(old_text: str, new_text: str) -> dict:
+    """
+    Compares two documents clause by clause without calling the model.
+
+    Clauses are aligned with a sequence match on their normalized text. Clauses
+    that left one place and appeared elsewhere count as unchanged, and the
+    remaining removed/added clauses are paired up as "modified" when they are
+    similar enough. Only nearby or same-heading clauses that share enough words
+    are compared, at most MAX_PAIR_COMPARISONS pairs.
+
+    Returns:
+        {"unchanged": [{"title"}],
+         "added": [{"title", "text"}],
+         "removed": [{"title", "text"}],
+         "modified": [{"title", "oldText", "newText", "similarity"}],
+         "stats": {...counts}}
+    """
+    old_clauses = split_clauses(old_text)
+    new_clauses = split_clauses(new_text)
+    old_keys = [clause_key(clause) for clause in old_clauses]
+    new_keys = [clause_key(clause) for clause in new_clauses]
+
+    unchanged = []
+    removed = []
+    added = []
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged.extend(new_clauses[j1:j2])
+            continue
+        removed.extend(range(i1, i2))
+        added.extend(range(j1, j2))
+
+    # Clauses that only moved
+    added_by_key = {}
+    for j in added:
+        added_by_key.setdefault(new_keys[j], []).append(j)
+    still_removed = []
+    for i in removed:
+        moved = added_by_key.get(old_keys[i])
+        if moved:
+            j = moved.pop(0)
+            added.remove(j)
+            unchanged.append(new_clauses[j])
+        else:
+            still_removed.append(i)
+    removed = still_removed
+
+    # Pair the most similar removed/added clauses as modifications. Comparing
+    # two clauses' text costs milliseconds, so cheap checks pick the pairs first.
+    new_titles = {j: _title(new_clauses[j]).lower() for j in added}
+    added_by_title = {}
+    for j in added:
+        added_by_title.setdefault(new_titles[j], []).append(j)
+    new_words = {j: set(WORD.findall(new_keys[j])) for j in added}
+    pairs = []
+    for rank, i in enumerate(removed):
+        check_deadline()
+        old_title = _title(old_clauses[i]).lower()
+        old_words = set(WORD.findall(old_keys[i]))
+        nearby = added[max(0, rank - PAIR_WINDOW):rank + PAIR_WINDOW + 1]
+        for j in set(nearby).union(added_by_title.get(old_title, ())):
+            same_title = new_titles[j] == old_title
+            overlap = _word_overlap(old_words, new_words[j])
+            if same_title or overlap >= MIN_WORD_OVERLAP:
+                pairs.append((same_title, overlap, i, j))
+
+    candidates = []
+    for same_title, overlap, i, j in sorted(pairs, reverse=True)[:MAX_PAIR_COMPARISONS]:
+        check_deadline()
+        score = _similarity(old_keys[i], new_keys[j])
+        if same_title:
+            # Same heading (e.g. "NOTICE PERIOD") is strong evidence it is the same clause
+            score = max(score, MODIFIED_SIMILARITY)
+        if score >= MODIFIED_SIMILARITY:
+            candidates.append((score, i, j))
+    modified = []
+    paired_old, paired_new = set(), set()
+    for score, i, j in sorted(candidates, reverse=True):
+        if i in paired_old or j in paired_new:
+            continue
+        paired_old.add(i)
+        paired_new.add(j)
+        modified.append((j, {
+            "title": _title(new_clauses[j]),
+            "oldText": old_clauses[i]["text"],
+            "newText": new_clauses[j]["text"],
+            "similarity": round(score, 3),
+        }))
+
+    result = {
+        "unchanged": [{"title": _title(clause)} for clause in unchanged],
+        "added": [
+            {"title": _title(new_clauses[j]), "text": new_clauses[j]["text"]} for j in added if j not in paired_new
+        ],
+        "removed": [
+            {"title": _title(old_clauses[i]), "text": old_clauses[i]["text"]} for i in removed if i not in paired_old
+        ],
+        "modified": [entry for _, entry in sorted(modified, key=lambda item: item[0])],
+    }
+    result["stats"] = {key: len(result[key]) for key in ("unchanged", "added", "removed", "modified")}
+    return result
+
+def has_changes(diff: dict) -> bool:
+    return bool(diff["added"] or diff["removed"] or diff["modified"])
+
+def format_changes(diff: dict) -> str:
+    """
+    Renders only the changed clauses of a diff for the comparison prompt.
+    """
+    sections = []
+    for entry in diff["added"]:
+        sections.append(f"[ADDED] {entry['title']}\nNew text: {entry['text']}")
+    for entry in diff["removed"]:
+        sections.append(f"[REMOVED] {entry['title']}\nOld text: {entry['text']}")
+    for entry in diff["modified"]:
+        sections.append(f"[MODIFIED] {entry['title']}\nOld text: {entry['oldText']}\nNew text: {entry['newText']}")
+    return "\n\n".join(sections)
@@ -0,0 +1,96 @@
+# backend/utils/deadlines.py
+
+import os
+import time
+import threading
+import contextvars
+
+# --- Deadline Settings ---
+# Every HTTP request runs under a deadline. Model calls are given the time that
+# is left as their network timeout, the scheduler stops waiting or retrying once
+# it has passed, and PDF extraction stops rendering pages and cancels the page
+# OCR calls it has not started yet. A deadline can also be cancelled early, e.g.
+# when a streaming client disconnects. Background jobs run under a deadline
+# with no time limit, which is only used to cancel them.
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "300"))
+# Longest single wait between deadline checks while blocked on other work
+DEADLINE_POLL_SECONDS = 0.5
+
+class DeadlineExceeded(Exception):
+    """Raised once the current request's deadline has passed or it was cancelled."""
+
+class Deadline:
+    """
+    A point in time after which the work of one request is abandoned.
+    With seconds=None it never expires and only stops the work once cancelled.
+    """
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        """
+        Seconds left, 0 once expired or cancelled, None if there is no time limit.
+        """
+        if self._cancelled.is_set():
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """
+        Raises:
+            DeadlineExceeded: If the deadline has passed or was cancelled.
+        """
+        if self._cancelled.is_set():
+            raise DeadlineExceeded("Request was cancelled")
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f"Request took longer than {self.seconds:.0f}s")
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+def start_deadline(seconds: float = REQUEST_TIMEOUT_SECONDS) -> Deadline:
+    """
+    Starts a deadline for the current request (or job, with seconds=None).
+    Worker threads started through metrics.traced() inherit it.
+    """
+    deadline = Deadline(seconds)
+    _deadline.set(deadline)
+    return deadline
+
+def current_deadline():
+    return _deadline.get()
+
+def check_deadline():
+    """
+    Raises DeadlineExceeded if the current deadline has passed; does nothing outside a request.
+    """
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+def remaining_seconds():
+    """
+    Seconds left before the current deadline, or None outside a request or without a time limit.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+def poll_timeout():
+    """
+    Timeout for one blocking wait between deadline checks (None: no deadline, wait as long as needed).
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline.remaining()
+    return DEADLINE_POLL_SECONDS if remaining is None else min(DEADLINE_POLL_SECONDS, remaining)
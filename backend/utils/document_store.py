@@ -0,0 +1,158 @@
+# backend/utils/document_store.py
+
+import os
+import json
+import uuid
+from abc import ABC, abstractmethod
+from .cache import DiskCache
+
+# Documents expire after DOCUMENT_TTL_SECONDS, and the oldest are evicted once
+# the store holds more than DOCUMENT_STORE_MAX_MB. Set DOCUMENT_STORE_URL to a
+# redis:// URL to share documents between boxes instead of one box's workers.
+DOCUMENT_TTL_SECONDS = int(os.getenv("DOCUMENT_TTL_SECONDS", str(2 * 3600)))
+DOCUMENT_STORE_MAX_MB = int(os.getenv("DOCUMENT_STORE_MAX_MB", "256"))
+DOCUMENT_STORE_URL = os.getenv("DOCUMENT_STORE_URL", "")
+
+class DocumentNotStored(Exception):
+    """Raised when a document could not be saved, e.g. it is larger than the whole store."""
+
+class DocumentStore(ABC):
+    """
+    Keeps an analyzed document (per-page texts, extraction report and analysis) under a
+    document ID so that follow-up requests on any worker can reuse it without
+    re-extracting the PDF. The full text is joined from the pages on load
+    rather than stored a second time.
+
+    Subclasses only need to provide _load, _save and _delete for raw JSON bytes;
+    _save raises DocumentNotStored when the write did not happen.
+    """
+    def put(self, pages: list, analysis=None, extraction=None) -> str:
+        """
+        Stores a new document and returns its ID.
+
+        Raises:
+            DocumentNotStored: If it could not be saved.
+        """
+        document_id = uuid.uuid4().hex
+        self._save(document_id, {"pages": pages, "analysis": analysis, "extraction": extraction})
+        return document_id
+
+    def get(self, document_id: str):
+        """
+        Returns {"text", "pages", "analysis", "extraction"} or None if the ID is unknown or expired.
+        """
+        document = self._load_document(document_id)
+        if document is not None and "text" not in document:
+            # Same join as pdf_processor.pages_to_text; documents stored before this kept their text
+            document["text"] = "\n".join(page for page in document["pages"] if page).strip()
+        return document
+
+    def _load_document(self, document_id: str):
+        """
+        Returns the document as stored, without the derived text.
+        """
+        if not document_id:
+            return None
+        raw = self._load(document_id)
+        return json.loads(raw) if raw is not None else None
+
+    def ingest_pdf(self, pdf_stream, extraction_mode=None, progress=None):
+        """
+        Extracts a PDF upload and stores it.
+
+        Returns:
+            (document_id, text, extraction): extraction is the per-page report of
+            pdf_processor.extraction_report. text is empty and the ID None if
+            nothing could be extracted.
+
+        Raises:
+            DocumentNotStored: If the extracted document could not be saved, so
+                               no ID is handed out that follow-up requests cannot find.
+        """
+        from .pdf_processor import extract_pages_from_pdf, pages_to_text, extraction_report
+        pages = extract_pages_from_pdf(pdf_stream, extraction_mode, progress)
+        text = pages_to_text(pages)
+        extraction = extraction_report(pages)
+        if not text:
+            return None, "", extraction
+        # The /ask retrieval index is built from the text by the first question that needs it
+        document_id = self.put([page["text"] for page in pages], extraction=extraction)
+        return document_id, text, extraction
+
+    def update(self, document_id: str, **fields) -> bool:
+        """
+        Merges fields (e.g. analysis) into a stored document. Returns False if it no longer exists.
+
+        Raises:
+            DocumentNotStored: If the updated document could not be saved.
+        """
+        document = self._load_document(document_id)
+        if document is None:
+            return False
+        document.update(fields)
+        self._save(document_id, document)
+        return True
+
+    def delete(self, document_id: str):
+        self._delete(document_id)
+
+    @abstractmethod
+    def _save(self, document_id: str, document: dict):
+        ...
+
+    @abstractmethod
+    def _load(self, document_id: str):
+        ...
+
+    @abstractmethod
+    def _delete(self, document_id: str):
+        ...
+
+class SQLiteDocumentStore(DocumentStore):
+    """
+    Document store on the shared SQLite cache file, which every gunicorn worker on the box can read.
+    """
+    def __init__(self):
+        self.cache = DiskCache("documents", DOCUMENT_STORE_MAX_MB * 1024 * 1024, ttl_seconds=DOCUMENT_TTL_SECONDS)
+
+    def _save(self, document_id: str, document: dict):
+        if not self.cache.set(document_id, json.dumps(document).encode("utf-8")):
+            raise DocumentNotStored(
+                f"The document could not be stored (the store keeps up to {DOCUMENT_STORE_MAX_MB} MB)."
+            )
+
+    def _load(self, document_id: str):
+        return self.cache.get(document_id)
+
+    def _delete(self, document_id: str):
+        self.cache.delete(document_id)
+
+class RedisDocumentStore(DocumentStore):
+    """
+    Document store on Redis. The memory budget is enforced by Redis itself
+    (maxmemory with an LRU policy); entries get the same TTL as locally.
+    """
+    def __init__(self, url: str):
+        import redis  # Only needed when DOCUMENT_STORE_URL points at Redis
+
+        self.redis = redis.Redis.from_url(url)
+
+    def _save(self, document_id: str, document: dict):
+        try:
+            self.redis.set(f"saralkanoon:document:{document_id}", json.dumps(document), ex=DOCUMENT_TTL_SECONDS)
+        except Exception as e:
+            raise DocumentNotStored(f"The document could not be stored: {e}") from e
+
+    def _load(self, document_id: str):
+        return self.redis.get(f"saralkanoon:document:{document_id}")
+
+    def _delete(self, document_id: str):
+        self.redis.delete(f"saralkanoon:document:{document_id}")
+
+def create_document_store() -> DocumentStore:
+    """
+    Picks the backend from DOCUMENT_STORE_URL (redis://...), defaulting to the local SQLite store.
+    """
+    if DOCUMENT_STORE_URL.startswith(("redis://", "rediss://")):
+        return RedisDocumentStore(DOCUMENT_STORE_URL)
+    return SQLiteDocumentStore()
@@ -0,0 +1,518 @@
+# backend/utils/jobs.py
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import threading
+import multiprocessing
+from .cache import CACHE_DIR
+from .metrics import start_trace, stage
+from .scheduler import lane
+from .deadlines import start_deadline
+
+# Long-running /analyze and /compare work is queued in SQLite and run by a
+# pool of job worker processes, so HTTP workers are never pinned by it.
+# Start the pool with `python -m utils.jobs` or by setting JOB_WORKERS for gunicorn.
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+JOBS_DB_PATH = os.path.join(JOBS_DIR, "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Queued + running jobs allowed before submissions are rejected with 429
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "20"))
+# Finished jobs (and their results) are kept this long
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# A running job whose worker has sent no heartbeat for this long is assumed lost and re-queued
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+# Runs of a job (first run plus re-queues after worker loss) before it is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = 1.0
+# A running job's worker marks it alive this often, also between progress reports
+JOB_HEARTBEAT_SECONDS = 30.0
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when JOB_QUEUE_MAX jobs are already waiting or running."""
+
+class JobQueue:
+    """
+    A job queue on a SQLite file shared by the HTTP workers (which submit and
+    poll) and the job workers (which claim and run). Uploaded files are
+    spooled next to the database and removed when their job finishes.
+    """
+    def __init__(self, path=None):
+        self.path = path or JOBS_DB_PATH
+        self.files_dir = os.path.join(os.path.dirname(self.path), "files")
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        os.makedirs(self.files_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                params TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        # Databases created before the attempts column
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if "attempts" not in columns:
+            try:
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # Added by another process in the meantime
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, kind: str, params: dict, files=None) -> str:
+        """
+        Queues a job and returns its ID.
+
+        Args:
+            kind: A key of JOB_HANDLERS ("analyze" or "compare").
+            params: JSON-serializable handler arguments.
+            files: Optional {name: file-like} uploads; each is spooled to disk and
+                   its path passed to the handler as params["files"][name].
+
+        Raises:
+            QueueFull: If JOB_QUEUE_MAX jobs are already queued or running.
+        """
+        conn = self._connect()
+        # Refuse early without spooling the upload; the count that decides is taken below
+        if self.pending_count() >= JOB_QUEUE_MAX:
+            raise QueueFull(f"{JOB_QUEUE_MAX} jobs are already waiting. Please retry shortly.")
+
+        job_id = uuid.uuid4().hex
+        params = dict(params, files={})
+        for name, stream in (files or {}).items():
+            path = os.path.join(self.files_dir, f"{job_id}-{name}.pdf")
+            with open(path, "wb") as spool:
+                while True:
+                    block = stream.read(1024 * 1024)
+                    if not block:
+                        break
+                    spool.write(block)
+            params["files"][name] = path
+
+        now = time.time()
+        # Counted and inserted in one write transaction, so concurrent submissions cannot all pass the check
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._prune(conn)
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if pending < JOB_QUEUE_MAX:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, status, params, created, updated) VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, json.dumps(params), now, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self._remove_files(job_id)
+            raise
+        if pending >= JOB_QUEUE_MAX:
+            self._remove_files(job_id)
+            raise QueueFull(f"{JOB_QUEUE_MAX} jobs are already waiting. Please retry shortly.")
+        return job_id
+
+    def pending_count(self) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()[0]
+
+    def get(self, job_id: str):
+        """
+        Returns the public view of a job, or None if it does not exist.
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "jobId": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": round(row["progress"], 3),
+            "message": row["message"],
+        }
+        if row["status"] == "queued":
+            job["queuePosition"] = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created <= ?", (row["created"],)
+            ).fetchone()[0]
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"]:
+            job["error"] = row["error"]
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued job immediately, or asks a running one to stop at its next checkpoint.
+        Returns False if the job does not exist or has already finished.
+        """
+        conn = self._connect()
+        now = time.time()
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', updated = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (now, job_id),
+        )
+        if cursor.rowcount:
+            self._remove_files(job_id)
+            return True
+        cursor = conn.execute(
+            "UPDATE jobs SET cancel_requested = 1, message = 'Cancelling', updated = ? "
+            "WHERE id = ? AND status = 'running'",
+            (now, job_id),
+        )
+        return bool(cursor.rowcount)
+
+    def claim(self):
+        """
+        Atomically takes the oldest queued job for this worker. Returns (id, kind, params) or None.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died mid-run go back to the queue, unless they
+            # have used up their attempts (likely the job itself kills the worker)
+            abandoned = [
+                row["id"] for row in conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'running' AND updated < ? AND attempts >= ?",
+                    (now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS),
+                )
+            ]
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', message = 'Failed', error = ?, updated = ? "
+                "WHERE status = 'running' AND updated < ? AND attempts >= ?",
+                (f"The job's worker was lost {JOB_MAX_ATTEMPTS} times", now, now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', message = 'Re-queued after worker loss' "
+                "WHERE status = 'running' AND updated < ?",
+                (now - JOB_STALE_SECONDS,),
+            )
+            row = conn.execute(
+                "SELECT id, kind, params FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', message = 'Started', attempts = attempts + 1, updated = ? "
+                    "WHERE id = ?",
+                    (now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for job_id in abandoned:
+            print(f"Job {job_id} failed: its worker was lost {JOB_MAX_ATTEMPTS} times")
+            self._remove_files(job_id)
+        if row is None:
+            return None
+        return row["id"], row["kind"], json.loads(row["params"])
+
+    def report_progress(self, job_id: str, progress: float, message: str = "") -> bool:
+        """
+        Records progress (0-1). Returns True once cancellation of the job has been requested.
+        """
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET progress = ?, message = ?, updated = ? WHERE id = ?",
+            (progress, message, time.time(), job_id),
+        )
+        return self._cancel_requested(conn, job_id)
+
+    def heartbeat(self, job_id: str) -> bool:
+        """
+        Marks a running job as alive without changing its progress. Returns True once cancellation has been requested.
+        """
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+        return self._cancel_requested(conn, job_id)
+
+    def _cancel_requested(self, conn, job_id: str) -> bool:
+        cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(cancelled and cancelled[0])
+
+    def finish(self, job_id: str, status: str, result=None, error=None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, "
+            "message = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+            (
+                status,
+                status,
+                status.capitalize(),
+                json.dumps(result) if result is not None else None,
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+        self._remove_files(job_id)
+
+    def _remove_files(self, job_id: str):
+        for name in os.listdir(self.files_dir):
+            if name.startswith(f"{job_id}-"):
+                try:
+                    os.remove(os.path.join(self.files_dir, name))
+                except OSError:
+                    pass
+
+    def _prune(self, conn):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated < ?", (*FINISHED_STATUSES, cutoff)
+        )
+
+# --- Job Handlers ---
+# Each handler gets (params, progress) and returns the JSON result of the job.
+# progress(fraction, message) never raises, as it is also called from OCR
+# threads; when the job has been cancelled it cancels the job's deadline, and
+# extraction and model calls stop at their next deadline check.
+
+_worker_state = {}
+
+def _worker_resources():
+    """
+    The AI client and document store used by job handlers, created once per worker process.
+    """
+    if not _worker_state:
+        from .model_registry import get_client
+        from .document_store import create_document_store
+
+        _worker_state["ai_client"] = get_client()
+        _worker_state["document_store"] = create_document_store()
+    return _worker_state["ai_client"], _worker_state["document_store"]
+
+def _ingest(document_store, path, extraction_mode, progress, start, span, label):
+    """
+    Extracts a spooled upload, mapping its page progress onto [start, start + span).
+    """
+    def on_page(entry, total_pages):
+        progress(start + span * entry["page"] / max(total_pages, 1), f"{label}: page {entry['page']} of {total_pages}")
+
+    with open(path, "rb") as pdf_stream:
+        return document_store.ingest_pdf(pdf_stream, extraction_mode, on_page)
+
+def run_analyze_job(params, progress):
+    ai_client, document_store = _worker_resources()
+    progress(0.0, "Extracting text")
+    document_id, text, extraction = _ingest(
+        document_store, params["files"]["document"], params.get("extraction_mode"), progress, 0.0, 0.7, "Extracting"
+    )
+    if not text:
+        raise ValueError("Could not extract text from PDF")
+
+    progress(0.7, "Analyzing document")
+    analysis = ai_client.analyze_document(
+        text, use_cache=params.get("use_cache", True), mode=params.get("analysis_mode")
+    )
+    if "error" in analysis:
+        raise ValueError(analysis["error"])
+    document_store.update(document_id, analysis=analysis)
+    return {**analysis, "documentId": document_id, "extraction": extraction}
+
+def run_compare_job(params, progress):
+    ai_client, document_store = _worker_resources()
+    texts = {}
+    for index, field in enumerate(("old_document", "new_document")):
+        document_id = params.get(f"{field}_id")
+        if document_id:
+            document = document_store.get(document_id)
+            if not document:
+                raise ValueError(f"Unknown or expired {field}_id")
+            texts[field] = (document_id, document["text"])
+        else:
+            texts[field] = _ingest(
+                document_store, params["files"][field], None, progress, 0.35 * index, 0.35, f"Extracting {field}"
+            )
+        if not texts[field][1]:
+            raise ValueError("Could not extract text from one or both PDFs.")
+
+    progress(0.7, "Comparing documents")
+    comparison = ai_client.compare_documents(
+        texts["old_document"][1], texts["new_document"][1], use_cache=params.get("use_cache", True)
+    )
+    if "error" in comparison:
+        raise ValueError(comparison["error"])
+    return {**comparison, "oldDocumentId": texts["old_document"][0], "newDocumentId": texts["new_document"][0]}
+
+JOB_HANDLERS = {
+    "analyze": run_analyze_job,
+    "compare": run_compare_job,
+}
+
+# --- Job Workers ---
+
+def run_job(job_queue: JobQueue, job_id: str, kind: str, params: dict):
+    """
+    Runs one claimed job and records its outcome.
+    """
+    def progress(fraction, message=""):
+        try:
+            if job_queue.report_progress(job_id, fraction, message):
+                deadline.cancel()
+        except Exception as e:
+            print(f"Job {job_id}: could not record progress: {e}")
+
+    def heartbeat():
+        # Long model calls report no progress; without this the job would look
+        # lost after JOB_STALE_SECONDS and be run a second time
+        while not finished.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                if job_queue.heartbeat(job_id):
+                    deadline.cancel()
+            except Exception as e:
+                print(f"Job {job_id}: could not send heartbeat: {e}")
+
+    # The job ID doubles as the trace ID of everything the job does
+    start_trace(job_id)
+    # No time limit; cancelled through progress() or heartbeat() once DELETE /jobs/<id> is requested
+    deadline = start_deadline(None)
+    finished = threading.Event()
+    threading.Thread(target=heartbeat, name=f"job-heartbeat-{job_id}", daemon=True).start()
+    try:
+        # Background work queues behind interactive requests for model capacity
+        with stage("job", kind=kind), lane("bulk"):
+            result = JOB_HANDLERS[kind](params, progress)
+        job_queue.finish(job_id, "done", result=result)
+        print(f"Job {job_id} ({kind}) done")
+    except Exception as e:
+        # Includes the DeadlineExceeded raised wherever the cancelled job was stopped
+        if deadline.cancelled:
+            job_queue.finish(job_id, "cancelled")
+            print(f"Job {job_id} ({kind}) cancelled")
+        else:
+            job_queue.finish(job_id, "failed", error=str(e))
+            print(f"Job {job_id} ({kind}) failed: {e}")
+    finally:
+        finished.set()
+
+def _default_signals():
+    # Processes forked from the gunicorn master inherit its handlers, which only
+    # wake the master's own loop (and reap its children): put the defaults back
+    for signum in (signal.SIGHUP, signal.SIGQUIT, signal.SIGINT, signal.SIGTERM, signal.SIGTTIN,
+                   signal.SIGTTOU, signal.SIGUSR1, signal.SIGUSR2, signal.SIGWINCH, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+
+def worker_loop(stop_event=None):
+    """
+    Claims and runs jobs until stop_event is set (or forever).
+    """
+    _default_signals()
+    job_queue = JobQueue()
+    print(f"Job worker {os.getpid()} started")
+    while not (stop_event and stop_event.is_set()):
+        claimed = job_queue.claim()
+        if claimed is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        run_job(job_queue, *claimed)
+
+def _start_worker():
+    process = multiprocessing.Process(target=worker_loop, name="saralkanoon-job-worker", daemon=True)
+    process.start()
+    return process
+
+def start_workers(count: int = JOB_WORKERS) -> list:
+    """
+    Starts count job worker processes and returns them.
+    """
+    return [_start_worker() for _ in range(count)]
+
+def stop_workers(processes: list):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout=10)
+
+def supervise(count: int = JOB_WORKERS):
+    """
+    Runs count job workers, starting a new one whenever one exits, until SIGTERM or SIGINT.
+    A job whose worker died is re-queued once it has been stale for JOB_STALE_SECONDS,
+    until it has been run JOB_MAX_ATTEMPTS times.
+    """
+    _default_signals()
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    workers = start_workers(count)
+    try:
+        while not stopping:
+            time.sleep(JOB_POLL_SECONDS)
+            for index, worker in enumerate(workers):
+                if not worker.is_alive() and not stopping:
+                    print(f"Job worker {worker.pid} exited with code {worker.exitcode}; starting a new one")
+                    workers[index] = _start_worker()
+    finally:
+        stop_workers(workers)
+
+def start_supervisor(count: int = JOB_WORKERS) -> int:
+    """
+    Forks a process running supervise(count) and returns its PID.
+
+    It is forked directly rather than as a multiprocessing child: processes
+    forked later from the caller (gunicorn's HTTP workers) would otherwise
+    inherit multiprocessing's child list and terminate the job workers when
+    they exit.
+    """
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            supervise(count)
+        except BaseException as e:
+            print(f"Job supervisor failed: {e}")
+            status = 1
+        finally:
+            os._exit(status)
+    return pid
+
+def stop_supervisor(pid: int, timeout: float = 15.0):
+    """
+    Stops a start_supervisor() process and its job workers.
+    """
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    waited_until = time.monotonic() + timeout
+    while time.monotonic() < waited_until:
+        try:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                return
+        except ChildProcessError:
+            # Already reaped, e.g. by gunicorn's SIGCHLD handler
+            return
+        time.sleep(0.1)
+    os.kill(pid, signal.SIGKILL)
+
+# --- Standalone worker pool: `python -m utils.jobs [workers]` from the backend directory ---
+if __name__ == '__main__':
+    from .metrics import prune_metrics_dir
+
+    prune_metrics_dir()
+    supervise(int(sys.argv[1]) if len(sys.argv) > 1 else JOB_WORKERS)
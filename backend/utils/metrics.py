@@ -0,0 +1,283 @@
+# backend/utils/metrics.py
+
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Metrics Settings ---
+# Every stage (page render, vision call, LLM call, TTS chunk, JSON parse...) is
+# timed into Prometheus histograms and, with METRICS_LOG_STAGES, logged as a JSON
+# line carrying the request's trace ID. Samples are kept in memory and each
+# process writes a snapshot to METRICS_DIR every few seconds, so GET /metrics
+# on any gunicorn worker reports the totals of all workers and job processes.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_LOG_STAGES = os.getenv("METRICS_LOG_STAGES", "true").lower() == "true"
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (10, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+# name -> (help, buckets); buckets is None for counters
+METRICS = {
+    "saralkanoon_stage_seconds": ("Time spent in each processing stage.", DURATION_BUCKETS),
+    "saralkanoon_stage_bytes": ("Bytes produced or sent by a stage (page images, audio).", SIZE_BUCKETS),
+    "saralkanoon_stage_chars": ("Characters sent to (in) and returned by (out) a stage.", COUNT_BUCKETS),
+    "saralkanoon_llm_tokens": ("Tokens reported by the model per call.", COUNT_BUCKETS),
+    "saralkanoon_extraction_rss_growth_bytes": (
+        "Peak growth of the process RSS during one PDF extraction (includes concurrent requests).", SIZE_BUCKETS + (67108864, 268435456, 1073741824),
+    ),
+    "saralkanoon_http_request_seconds": ("Time to the response headers per endpoint.", DURATION_BUCKETS),
+    "saralkanoon_stage_errors_total": ("Stages that raised an exception.", None),
+    "saralkanoon_retries_total": ("Retried upstream calls.", None),
+    "saralkanoon_cache_lookups_total": ("Cache lookups by cache and result (hit/miss).", None),
+    "saralkanoon_rate_limited_total": ("Model calls that gave up waiting for rate-limit capacity.", None),
+    "saralkanoon_circuit_opened_total": ("Times the model-call circuit breaker opened.", None),
+}
+
+_trace_id = contextvars.ContextVar("trace_id", default="")
+
+_lock = threading.Lock()
+# (name, ((label, value), ...)) -> counter value, or [bucket counts..., +Inf count, sum] for histograms
+_samples = {}
+_state = {"flushed": 0.0}
+
+def _reset():
+    _samples.clear()
+    _state["flushed"] = 0.0
+
+# A forked worker starts with empty samples instead of double-counting its parent's
+os.register_at_fork(after_in_child=_reset)
+
+def metrics_dir() -> str:
+    if METRICS_DIR:
+        return METRICS_DIR
+    from .cache import CACHE_DIR
+    return os.path.join(CACHE_DIR, "metrics")
+
+# --- Trace IDs ---
+
+def start_trace(trace_id: str = None) -> str:
+    """
+    Sets the trace ID for the current request (or job), generating one if none is given.
+    """
+    trace_id = (trace_id or uuid.uuid4().hex[:16])[:64]
+    _trace_id.set(trace_id)
+    return trace_id
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+def traced(fn):
+    """
+    Wraps fn so it runs under the caller's context (trace ID, request deadline,
+    scheduler lane), for work handed to thread pools.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A fresh copy per run, since one context cannot be entered by two threads at once
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+def log_event(event: str, **fields):
+    """
+    Writes one structured JSON log line tagged with the current trace ID.
+    """
+    record = {"ts": round(time.time(), 3), "trace_id": _trace_id.get(), "event": event, **fields}
+    print(json.dumps(record, default=str))
+
+# --- Recording ---
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+def inc(name: str, amount: float = 1, **labels):
+    """
+    Adds amount to a counter.
+    """
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _samples[key] = _samples.get(key, 0) + amount
+    _maybe_flush()
+
+def observe(name: str, value: float, **labels):
+    """
+    Records one histogram observation.
+    """
+    if not METRICS_ENABLED:
+        return
+    buckets = METRICS[name][1]
+    key = _key(name, labels)
+    with _lock:
+        sample = _samples.get(key)
+        if sample is None:
+            sample = _samples[key] = [0] * (len(buckets) + 2)
+        sample[bisect.bisect_left(buckets, value)] += 1
+        sample[-1] += value
+    _maybe_flush()
+
+@contextmanager
+def stage(name: str, **fields):
+    """
+    Times a block as one stage. The yielded dict collects what the block did:
+    "bytes", "chars_in", "chars_out", "tokens_in" and "tokens_out" feed the
+    histograms; any other key (page, cached, ...) only goes into the log line.
+
+    Usage:
+        with stage("vision_call", pages=4) as span:
+            ...
+            span["chars_out"] = len(text)
+    """
+    span = dict(fields)
+    if not METRICS_ENABLED:
+        yield span
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        observe("saralkanoon_stage_seconds", seconds, stage=name)
+        if span.get("bytes") is not None:
+            observe("saralkanoon_stage_bytes", span["bytes"], stage=name)
+        for direction in ("in", "out"):
+            if span.get(f"chars_{direction}") is not None:
+                observe("saralkanoon_stage_chars", span[f"chars_{direction}"], stage=name, direction=direction)
+            if span.get(f"tokens_{direction}") is not None:
+                observe("saralkanoon_llm_tokens", span[f"tokens_{direction}"], stage=name, direction=direction)
+        if error is not None and not isinstance(error, GeneratorExit):
+            inc("saralkanoon_stage_errors_total", stage=name)
+            span["error"] = type(error).__name__
+        if METRICS_LOG_STAGES:
+            log_event("stage", stage=name, ms=round(seconds * 1000, 2), **{k: v for k, v in span.items() if v is not None})
+
+# --- Export ---
+
+def _maybe_flush():
+    if time.monotonic() - _state["flushed"] >= METRICS_FLUSH_SECONDS:
+        flush()
+
+def flush():
+    """
+    Writes this process's samples to METRICS_DIR so other processes can report them.
+    """
+    _state["flushed"] = time.monotonic()
+    with _lock:
+        snapshot = [
+            [name, labels, list(value) if isinstance(value, list) else value] for (name, labels), value in _samples.items()
+        ]
+    try:
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(snapshot, f)
+        # Readers only ever see a complete snapshot
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not write metrics snapshot: {e}")
+
+def reset_metrics_dir():
+    """
+    Removes the snapshots of earlier server runs. Called by gunicorn before the workers start.
+    """
+    directory = metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith(".json"):
+            os.remove(os.path.join(directory, filename))
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def prune_metrics_dir():
+    """
+    Removes the snapshots (and unfinished temp files) of processes that are no
+    longer running, e.g. from an earlier `python app.py`. Unlike
+    reset_metrics_dir it is safe while other workers are serving, so every
+    process can call it at startup.
+    """
+    directory = metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        pid = filename.split(".", 1)[0]
+        if not pid.isdigit() or not filename.endswith((".json", ".tmp")) or _process_running(int(pid)):
+            continue
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError:
+            pass
+
+def _merged_samples() -> dict:
+    flush()
+    merged = {}
+    directory = metrics_dir()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                merged[key] = [a + b for a, b in zip(total, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+def _format_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+def render_prometheus() -> str:
+    """
+    All processes' metrics in the Prometheus text exposition format.
+    """
+    samples = _merged_samples()
+    lines = []
+    for name, (help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in samples.items() if metric == name)
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {'counter' if buckets is None else 'histogram'}")
+        for labels, value in series:
+            if buckets is None:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+# backend/utils/model_registry.py
+
+import os
+import sys
+import threading
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# One configured SDK, one GenerativeModel per model name and one GeminiClient
+# per model name for each worker process. They are shared by all request
+# threads so connections are reused instead of being rebuilt per call.
+_lock = threading.RLock()
+_state = {"pid": None, "models": {}, "clients": {}}
+
+def _reset():
+    _state["pid"] = None
+    _state["models"] = {}
+    _state["clients"] = {}
+
+# gRPC channels do not survive a fork, so a forked gunicorn worker starts
+# from a clean registry and configures its own connections on first use
+os.register_at_fork(after_in_child=_reset)
+
+def load_sdk():
+    """
+    Imports the Gemini SDK. It takes most of a second, so it is left until the
+    first model is needed (or done up front by preload.preload()).
+    """
+    import google.generativeai as genai
+    return genai
+
+def require_api_key() -> str:
+    """
+    Raises:
+        ValueError: If GEMINI_API_KEY is not set.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
+    return api_key
+
+def _ensure_configured():
+    """
+    Configures the Gemini SDK once per process. Must be called with _lock held.
+    """
+    if _state["pid"] == os.getpid():
+        return
+    load_sdk().configure(api_key=require_api_key(), transport=gemini_transport())
+    _state["pid"] = os.getpid()
+
+def gemini_transport():
+    """
+    GEMINI_TRANSPORT if set; otherwise "rest" under gevent (its blocking gRPC
+    calls would stall every greenlet in the worker) and the SDK default (gRPC) elsewhere.
+    """
+    transport = os.getenv("GEMINI_TRANSPORT")
+    if transport:
+        return transport
+    if "gevent" in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched("socket"):
+            return "rest"
+    return None
+
+def get_model(model_name: str = DEFAULT_MODEL):
+    """
+    Returns this process's shared GenerativeModel for model_name.
+    """
+    with _lock:
+        _ensure_configured()
+        model = _state["models"].get(model_name)
+        if model is None:
+            model = load_sdk().GenerativeModel(model_name)
+            _state["models"][model_name] = model
+        return model
+
+def get_client(model_name: str = DEFAULT_MODEL):
+    """
+    Returns this process's shared GeminiClient for model_name.
+
+    Raises:
+        ValueError: If GEMINI_API_KEY is not set.
+    """
+    with _lock:
+        client = _state["clients"].get(model_name)
+        if client is None:
+            from .ai_client import GeminiClient
+
+            client = GeminiClient(model_name)
+            _state["clients"][model_name] = client
+        return client
+
+def set_client(client, model_name: str = DEFAULT_MODEL):
+    """
+    Replaces the shared client for model_name in this process, e.g. with a local stand-in.
+    """
+    with _lock:
+        _state["clients"][model_name] = client
@@ -1,138 +1,543 @@
 
 
-import fitz  # PyMuPDF
 import os
 import concurrent.futures
-from PIL import Image
-import io
+import functools
+import hashlib
+import tempfile
+import threading
+import time
+from .cache import CACHE_DIR, DiskCache, sha256_hex
+from .metrics import stage, traced, observe
+from .deadlines import DeadlineExceeded, check_deadline, poll_timeout
 
-def optimize_image_bytes(img_data: bytes) -> bytes:
+# --- Extraction Settings ---
+# "auto" uses the embedded text layer when it is good enough and only sends
+# scanned / image-only pages to the vision model. "text-only" never calls the
+# vision model and "ocr-only" restores the old behaviour of OCR-ing every page.
+EXTRACTION_MODES = ("auto", "text-only", "ocr-only")
+DEFAULT_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "auto")
+
+# A page needs at least this many letters/digits in its text layer to be trusted
+MIN_TEXT_LAYER_CHARS = int(os.getenv("PDF_MIN_TEXT_LAYER_CHARS", "50"))
+# Pages mostly covered by images need more text than that (e.g. a scan with a typed header)
+MIN_SCANNED_PAGE_CHARS = int(os.getenv("PDF_MIN_SCANNED_PAGE_CHARS", "200"))
+MAX_IMAGE_COVERAGE = 0.5
+MAX_GARBAGE_RATIO = 0.1
+
+# Scanned pages are OCR'd in parallel. PDF_OCR_MAX_IN_FLIGHT caps how many
+# rendered pages may be waiting on (or inside) a vision call at once, which
+# also bounds how many page images are held in memory per request.
+OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", "4"))
+OCR_MAX_IN_FLIGHT = max(OCR_WORKERS, int(os.getenv("PDF_OCR_MAX_IN_FLIGHT", "8")))
+# Up to PDF_OCR_BATCH_PAGES consecutive scanned pages share one vision request
+# (1 sends every page on its own). Batches whose response is truncated are
+# split in half, and batches that fail are retried one page at a time.
+OCR_BATCH_PAGES = max(1, int(os.getenv("PDF_OCR_BATCH_PAGES", "4")))
+
+# Extraction results are cached on disk, shared by all workers: whole documents
+# by a hash of the PDF bytes, and OCR'd pages by a hash of the rendered image.
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+extraction_cache = DiskCache("extraction", int(os.getenv("EXTRACTION_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+# --- Upload Limits ---
+# Uploads are copied block by block to a temp file under PDF_SPOOL_DIR (hashed
+# on the way) and MuPDF reads pages from that file as it needs them, so a PDF
+# is never held in memory as a whole. Uploads over MAX_UPLOAD_MB or with more
+# than MAX_PDF_PAGES pages are rejected before any page is rendered or OCR'd.
+# At most PDF_MAX_CONCURRENT_EXTRACTIONS PDFs are extracted at once per
+# process; with the OCR in-flight cap this bounds the memory extraction can use.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "500"))
+MAX_CONCURRENT_EXTRACTIONS = int(os.getenv("PDF_MAX_CONCURRENT_EXTRACTIONS", "4"))
+SPOOL_DIR = os.getenv("PDF_SPOOL_DIR", os.path.join(CACHE_DIR, "uploads"))
+SPOOL_BLOCK_BYTES = 1024 * 1024
+
+class PdfRejected(ValueError):
+    """Raised for an upload over MAX_UPLOAD_MB or MAX_PDF_PAGES, before any OCR is spent on it."""
+
+_extraction_slots = threading.BoundedSemaphore(MAX_CONCURRENT_EXTRACTIONS)
+
+# --- Page Image Settings ---
+# Pages that need OCR are rasterized straight to grayscale and encoded once as
+# JPEG. An ordinary page is rendered at 72 dpi with its long side kept between
+# 768 and PDF_PAGE_LONG_EDGE pixels; small print gets up to PDF_PAGE_MAX_LONG_EDGE,
+# and scans are never rendered above the resolution of the embedded image.
+PAGE_IMAGE_MIME_TYPE = "image/jpeg"
+PAGE_LONG_EDGE = int(os.getenv("PDF_PAGE_LONG_EDGE", "1024"))
+PAGE_MAX_LONG_EDGE = int(os.getenv("PDF_PAGE_MAX_LONG_EDGE", "1600"))
+PAGE_MIN_LONG_EDGE = 768
+# Letters per square inch above which a page counts as dense (about 10pt text fills ~40)
+DENSE_TEXT_PER_SQ_INCH = 30
+PAGE_JPEG_QUALITY = int(os.getenv("PDF_PAGE_JPEG_QUALITY", "80"))
+PAGE_MIN_JPEG_QUALITY = 50
+# Per-page budget: pages over PDF_PAGE_MAX_KB are re-encoded at lower quality,
+# then lower resolution, until they fit or PDF_PAGE_RENDER_BUDGET_MS is spent
+PAGE_MAX_BYTES = int(os.getenv("PDF_PAGE_MAX_KB", "400")) * 1024
+PAGE_RENDER_BUDGET_SECONDS = int(os.getenv("PDF_PAGE_RENDER_BUDGET_MS", "1500")) / 1000
+
+def extract_text_layer(page) -> str:
     """
-    Optimize the image for faster processing:
-    - Convert to grayscale
-    - Resize to max 1024x1024
-    - Optimize quality
+    Reads the embedded text layer of a page, keeping block order so that
+    paragraphs and clause numbering come out the way they appear on the page.
     """
-    img = Image.open(io.BytesIO(img_data))
-    
-    # Convert to grayscale
-    img = img.convert('L')
-    
-    # Set maximum dimensions
-    max_size = (1024, 1024)
-    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-    
-    # Convert back to bytes with JPEG format and optimized settings
-    output = io.BytesIO()
-    img.save(output, format='JPEG', quality=85, optimize=True)
-    return output.getvalue()
+    blocks = page.get_text("blocks", sort=True)
+    # Each block is (x0, y0, x1, y1, text, block_no, block_type); type 0 is text
+    return "\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+
+def classify_page(page, layer_text: str) -> tuple:
+    """
+    Decides whether a page's text layer is good enough to use directly.
+
+    Returns:
+        A ("text-layer" | "ocr", reason) tuple.
+    """
+    letters = sum(1 for ch in layer_text if ch.isalnum())
+    if letters < MIN_TEXT_LAYER_CHARS:
+        return "ocr", "no usable text layer"
+
+    # Broken font encodings show up as replacement / control characters
+    garbage = sum(1 for ch in layer_text if ch == "\ufffd" or (not ch.isprintable() and not ch.isspace()))
+    if garbage / len(layer_text) > MAX_GARBAGE_RATIO:
+        return "ocr", "garbled text layer"
+
+    import fitz  # PyMuPDF
+
+    page_area = abs(page.rect) or 1
+    image_area = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    if image_area / page_area > MAX_IMAGE_COVERAGE and letters < MIN_SCANNED_PAGE_CHARS:
+        return "ocr", "mostly image"
+
+    return "text-layer", "embedded text"
+
+def choose_render_scale(page, layer_text: str = "") -> float:
+    """
+    Picks the zoom factor for rasterizing a page from its size and text density.
+
+    Args:
+        page: The PyMuPDF page.
+        layer_text: The page's text layer, if any, used to spot small print.
+
+    Returns:
+        The zoom factor to pass to fitz.Matrix.
+    """
+    import fitz  # PyMuPDF
+
+    rect = page.rect
+    long_edge_pt = max(rect.width, rect.height) or 1
+    # One pixel per point, so small pages are enlarged and oversized ones shrunk
+    target = min(max(long_edge_pt, PAGE_MIN_LONG_EDGE), PAGE_LONG_EDGE)
+
+    # Dense pages (small print, tables) need more pixels per character to OCR reliably
+    letters = sum(1 for ch in layer_text if ch.isalnum())
+    area_sq_inch = (abs(rect) or 1) / (72 * 72)
+    if letters / area_sq_inch > DENSE_TEXT_PER_SQ_INCH:
+        target = PAGE_MAX_LONG_EDGE
+
+    # Rendering a scan above its own resolution only makes the image bigger
+    native = 0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & rect
+        if bbox.is_empty or not bbox.width:
+            continue
+        native = max(native, info["width"] / bbox.width * long_edge_pt)
+    if native:
+        target = min(target, max(native, PAGE_MIN_LONG_EDGE))
+
+    return target / long_edge_pt
 
-def process_page(page, gemini):
+def render_page_image(page, layer_text: str = "") -> tuple:
     """
-    Process a single page sequentially with optimization and error handling.
+    Rasterizes a page straight to grayscale and encodes it once for the vision model,
+    staying within the per-page byte budget where the time budget allows.
+    PyMuPDF documents are not thread-safe, so this must run on the thread that owns the document.
+
+    Returns:
+        An (image_bytes, mime_type) tuple.
+    """
+    with stage("page_render", page=page.number + 1) as span:
+        image_bytes, scale, quality = _render_within_budget(page, layer_text)
+        span.update(bytes=len(image_bytes), scale=round(scale, 3), quality=quality)
+        return image_bytes, PAGE_IMAGE_MIME_TYPE
+
+def _render_within_budget(page, layer_text: str) -> tuple:
+    import fitz  # PyMuPDF
+
+    started = time.perf_counter()
+    long_edge_pt = max(page.rect.width, page.rect.height) or 1
+    scale = choose_render_scale(page, layer_text)
+    while True:
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+        # Too big: lower the quality first, since that only needs a re-encode
+        for quality in range(PAGE_JPEG_QUALITY, PAGE_MIN_JPEG_QUALITY - 1, -15):
+            image_bytes = pix.tobytes("jpeg", jpg_quality=quality)
+            if len(image_bytes) <= PAGE_MAX_BYTES or time.perf_counter() - started > PAGE_RENDER_BUDGET_SECONDS:
+                return image_bytes, scale, quality
+        pix = None
+        # Then the resolution, down to the smallest size that is still legible
+        if long_edge_pt * scale <= PAGE_MIN_LONG_EDGE:
+            return image_bytes, scale, quality
+        scale = max(scale * 0.8, PAGE_MIN_LONG_EDGE / long_edge_pt)
+
+def ocr_page_image(image_bytes: bytes, gemini, mime_type: str = PAGE_IMAGE_MIME_TYPE) -> str:
+    """
+    Sends a rendered page to Gemini Vision. Safe to call from worker threads.
+    Throttled and transient upstream errors are retried by the shared scheduler.
+    """
+    return gemini.extract_text_from_image(image_bytes, mime_type)
+
+def ocr_page_batch(images: list, gemini) -> list:
+    """
+    OCRs several rendered pages with as few vision calls as possible. Safe to call from worker threads.
+
+    Args:
+        images: (image_bytes, mime_type) tuples in page order.
+        gemini: The client; needs extract_text_from_images for batches of more than one page.
+
+    Returns:
+        One entry per page, in order: the page text, or the exception the page failed with.
     """
-    pix = None
-    result = ""
+    if not images:
+        return []
+    if len(images) == 1:
+        image_bytes, mime_type = images[0]
+        try:
+            return [ocr_page_image(image_bytes, gemini, mime_type)]
+        except Exception as e:
+            return [e]
+
     try:
-        # Use a lower scale factor for the initial render
-        pix = page.get_pixmap(matrix=fitz.Matrix(1.0, 1.0))
-        img_data = pix.tobytes("png")
-        
-        # Optimize image before sending to Gemini
-        optimized_data = optimize_image_bytes(img_data)
-        
-        # Use Gemini Vision to extract text with retries
-        max_retries = 2
-        retry_count = 0
-        last_error = None
-        
-        while retry_count < max_retries:
-            try:
-                result = gemini.extract_text_from_image(optimized_data)
-                if result:
-                    break
-            except Exception as e:
-                last_error = e
-                retry_count += 1
-                if retry_count < max_retries:
-                    print(f"Retrying page after error: {str(e)}")
-                    import time
-                    time.sleep(2)  # Wait 2 seconds before retry
-        
-        if last_error and not result:
-            raise last_error
-        
-        return result
-            
+        texts = gemini.extract_text_from_images(images)
     except Exception as e:
-        print(f"Error processing page: {str(e)}")
-        return ""  # Return empty string on error to continue processing
-    finally:
-        # Clean up
-        if pix:
-            pix = None
+        print(f"Batch of {len(images)} pages failed ({str(e)}), retrying page by page")
+        return [ocr_page_batch([image], gemini)[0] for image in images]
+
+    # Pages missing from the response (usually a truncated output) are retried in smaller batches
+    missing = [index for index, text in enumerate(texts) if not (text and text.strip())]
+    if missing:
+        print(f"Batch of {len(images)} pages returned {len(images) - len(missing)}, splitting the rest")
+        retry = [images[index] for index in missing]
+        half = (len(retry) + 1) // 2
+        retried = ocr_page_batch(retry[:half], gemini) + ocr_page_batch(retry[half:], gemini)
+        for index, result in zip(missing, retried):
+            texts[index] = result
+    return texts
+
+def ocr_and_cache_batch(batch: list, gemini) -> list:
+    """
+    OCRs a batch of (image_bytes, mime_type, page_key) pages and stores each
+    page's text under its content hash.
+    """
+    results = ocr_page_batch([(image_bytes, mime_type) for image_bytes, mime_type, _ in batch], gemini)
+    for (_, _, page_key), text in zip(batch, results):
+        if isinstance(text, str) and text.strip() and EXTRACTION_CACHE_ENABLED:
+            extraction_cache.set(page_key, text.strip().encode("utf-8"))
+    return results
+
+class SpooledPdf:
+    """
+    A PDF upload on disk with its size and SHA-256. Uploads that are not files
+    on disk yet are copied to PDF_SPOOL_DIR, and that copy is removed on close.
+    """
 
-def extract_text_from_pdf(pdf_stream):
+    def __init__(self, path: str, size: int, sha256: str, owned: bool):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self._owned = owned
+
+    def close(self):
+        if self._owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _read_blocks(pdf_stream, sink=None):
+    """
+    Reads a stream block by block, returning (size, sha256) and copying each block to sink if given.
+
+    Raises:
+        PdfRejected: As soon as more than MAX_UPLOAD_BYTES have been read.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        block = pdf_stream.read(SPOOL_BLOCK_BYTES)
+        if not block:
+            return size, digest.hexdigest()
+        size += len(block)
+        if size > MAX_UPLOAD_BYTES:
+            raise PdfRejected(f"The PDF is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+        digest.update(block)
+        if sink is not None:
+            sink.write(block)
+
+def spool_pdf(pdf_stream) -> SpooledPdf:
     """
-    Extracts text from a PDF file stream using sequential processing and
-    optimized image handling to minimize memory usage.
+    Puts an upload on disk without reading it into memory as a whole.
+
+    Args:
+        pdf_stream: A file-like object, e.g. Flask's request.files[...].stream,
+                    an open file, or a SpooledPdf (returned as is).
+
+    Raises:
+        PdfRejected: If the upload is larger than MAX_UPLOAD_MB.
+    """
+    if isinstance(pdf_stream, SpooledPdf):
+        return pdf_stream
+    path = getattr(pdf_stream, "name", None)
+    if isinstance(path, str) and os.path.isfile(path):
+        # Already a file (e.g. a job's upload): only hash it
+        size, sha256 = _read_blocks(pdf_stream)
+        return SpooledPdf(path, size, sha256, owned=False)
+
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    spool = tempfile.NamedTemporaryFile(dir=SPOOL_DIR, suffix=".pdf", delete=False)
+    try:
+        with spool:
+            size, sha256 = _read_blocks(pdf_stream, spool)
+    except BaseException:
+        os.remove(spool.name)
+        raise
+    return SpooledPdf(spool.name, size, sha256, owned=True)
+
+def _rss_bytes():
+    # Current resident set size from /proc (Linux); None elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def extract_pages_from_pdf(pdf_stream, mode=None, progress=None) -> list:
+    """
+    Extracts text from every page of a PDF, using the embedded text layer where
+    possible and Gemini Vision for scanned pages.
 
     Args:
         pdf_stream: A file-like object (stream) of the PDF file.
                    For example, the object you get from Flask's request.files.
+                   It is read block by block (see spool_pdf).
+        mode: One of EXTRACTION_MODES. Defaults to PDF_EXTRACTION_MODE.
+        progress: Optional callback, progress(entry, total_pages), called as each
+                  page finishes. It may be called from OCR worker threads.
 
     Returns:
-        A single string containing all the text from the PDF.
+        A list with one dict per page: {"page", "method", "reason", "chars", "cached", "text"}.
+        "method" is "text-layer", "ocr" or "failed".
 
     Raises:
-        Exception: If text extraction completely fails
+        PdfRejected: If the upload is over MAX_UPLOAD_MB or MAX_PDF_PAGES.
     """
-    from .ai_client import GeminiClient
-    
-    full_text = ""
-    try:
-        gemini = GeminiClient()
-        print("Initialized Gemini client successfully")
-        
-        pdf_bytes = pdf_stream.read()
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        
+    mode = mode or DEFAULT_EXTRACTION_MODE
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}'. Use one of {EXTRACTION_MODES}.")
+
+    with stage("extraction", mode=mode) as span, spool_pdf(pdf_stream) as pdf:
+        span["bytes"] = pdf.size
+        # Wait for an extraction slot (giving up at the request deadline)
+        while not _extraction_slots.acquire(timeout=poll_timeout()):
+            check_deadline()
+        rss_before = _rss_bytes()
+        rss_peak = [rss_before]
+        try:
+            pages = _extract_pages(pdf, mode, progress, rss_peak)
+        finally:
+            _extraction_slots.release()
+        span.update(
+            pages=len(pages),
+            ocr_pages=sum(1 for page in pages if page["method"] == "ocr"),
+            cached_pages=sum(1 for page in pages if page["cached"]),
+            failed_pages=sum(1 for page in pages if page["method"] == "failed"),
+            chars_out=sum(page["chars"] for page in pages),
+        )
+        if rss_before is not None:
+            # Process-wide, so concurrent requests show up in each other's numbers
+            span["rss_growth_mb"] = round((rss_peak[0] - rss_before) / (1024 * 1024), 1)
+            observe("saralkanoon_extraction_rss_growth_bytes", rss_peak[0] - rss_before)
+        return pages
+
+def _extract_pages(pdf: SpooledPdf, mode, progress, rss_peak) -> list:
+    # PyMuPDF is only loaded by the first extraction (or preload.preload())
+    import fitz  # PyMuPDF
+
+    doc_key = f"doc:{mode}:{pdf.sha256}"
+    if EXTRACTION_CACHE_ENABLED:
+        cached_pages = extraction_cache.get_json(doc_key)
+        if cached_pages is not None:
+            print(f"Extraction cache hit for all {len(cached_pages)} pages")
+            for entry in cached_pages:
+                entry["cached"] = True
+                if progress:
+                    progress(entry, len(cached_pages))
+            return cached_pages
+
+    gemini = None
+    pages = []
+    # Opened from the file: MuPDF reads each page's objects when the page is loaded
+    doc = fitz.open(pdf.path, filetype="pdf")
+    total_pages = len(doc)
+    if total_pages > MAX_PDF_PAGES:
+        doc.close()
+        raise PdfRejected(f"The PDF has {total_pages} pages; at most {MAX_PDF_PAGES} are supported.")
+
+    def report(entry):
+        if progress:
+            progress(entry, total_pages)
+
+    def record(entry, method, reason, text, cached=False):
+        text = (text or "").strip()
+        entry.update(method=method if text else "failed", reason=reason, chars=len(text), cached=cached, text=text)
+        print(f"Page {entry['page']}: {entry['method']} ({reason}, {entry['chars']} chars{', cached' if cached else ''})")
+        report(entry)
+
+    def ocr_failed(entry, error):
+        entry["reason"] = str(error)
+        print(f"Error processing page {entry['page']}: {str(error)}")
+        report(entry)
+
+    def ocr_done(batch_entries, future):
+        # A done-callback must not raise (concurrent.futures only logs it), and
+        # every slot of the batch is released whatever happens, or the page loop
+        # would wait for a free slot forever
         try:
-            total_pages = len(doc)
-            print(f"Processing {total_pages} pages sequentially...")
-            
-            # Process each page sequentially
-            for page_num in range(total_pages):
-                print(f"Processing page {page_num + 1} of {total_pages}...")
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [e] * len(batch_entries)
+            for (entry, reason), result in zip(batch_entries, results):
                 try:
-                    page = doc.load_page(page_num)
-                    text = process_page(page, gemini)
-                    
-                    if text and text.strip():
-                        print(f"Successfully extracted text from page {page_num + 1}")
-                        full_text += text + "\n"
+                    if isinstance(result, Exception):
+                        ocr_failed(entry, result)
                     else:
-                        print(f"No text extracted from page {page_num + 1}")
+                        record(entry, "ocr", reason, result)
                 except Exception as e:
-                    print(f"Error processing page {page_num + 1}: {str(e)}")
-                    continue
+                    print(f"Error recording page {entry['page']}: {e}")
         finally:
-            # Always close the document
-            doc.close()
-        
-        # Check if we got any text at all
-        if not full_text.strip():
-            raise Exception("No text could be extracted from the PDF")
-            
-        return full_text.strip()
-                
-    except Exception as e:
-        print(f"Error in PDF processing: {str(e)}")
-        if not full_text.strip():
-            raise Exception("Failed to extract text from PDF") from e
-        return full_text.strip()  # Return any text we managed to extract
-            
+            for _ in batch_entries:
+                in_flight.release()
+
+    def submit_batch():
+        batch_entries = [(entry, reason) for entry, reason, _ in pending]
+        batch = [item for _, _, item in pending]
+        pending.clear()
+        try:
+            future = executor.submit(traced(ocr_and_cache_batch), batch, gemini)
+        except Exception as e:
+            for _ in batch_entries:
+                in_flight.release()
+            for entry, _ in batch_entries:
+                ocr_failed(entry, e)
+            return
+        futures.append(future)
+        future.add_done_callback(functools.partial(ocr_done, batch_entries))
+
+    # Every page waiting in a batch holds a slot, so there must be room for a
+    # full batch per worker plus the one being filled
+    in_flight = threading.BoundedSemaphore(max(OCR_MAX_IN_FLIGHT, OCR_BATCH_PAGES * (OCR_WORKERS + 1)))
+    executor = None
+    futures = []
+    # Rendered pages waiting to fill the next batch: (entry, reason, (image_bytes, mime_type, page_key))
+    pending = []
+    finished = False
+
+    try:
+        print(f"Processing {total_pages} pages (mode: {mode})...")
+
+        for page_num in range(total_pages):
+            # Past the request deadline (or cancelled): stop before rendering more pages
+            check_deadline()
+            entry = {"page": page_num + 1, "method": "failed", "reason": "", "chars": 0, "cached": False, "text": ""}
+            pages.append(entry)
+            try:
+                page = doc.load_page(page_num)
+
+                if mode == "ocr-only":
+                    method, reason, text = "ocr", "ocr-only mode", ""
+                else:
+                    text = extract_text_layer(page)
+                    method, reason = classify_page(page, text)
+                    if mode == "text-only":
+                        method, reason = "text-layer", "text-only mode"
 
+                if method != "ocr":
+                    record(entry, method, reason, text)
+                    continue
+
+                # Wait for a free slot before rendering so that at most
+                # OCR_MAX_IN_FLIGHT page images exist at once
+                while not in_flight.acquire(timeout=poll_timeout()):
+                    check_deadline()
+                try:
+                    image_bytes, mime_type = render_page_image(page, text)
+                    # MuPDF keeps decoded scans in a process-wide store of up to 256 MB;
+                    # each page is rendered once, so drop them instead of caching
+                    fitz.TOOLS.store_shrink(100)
+                    rss = _rss_bytes()
+                    if rss is not None and rss > rss_peak[0]:
+                        rss_peak[0] = rss
+                    page_key = f"page:{sha256_hex(image_bytes)}"
+                    cached_text = extraction_cache.get(page_key) if EXTRACTION_CACHE_ENABLED else None
+                    if cached_text is not None:
+                        in_flight.release()
+                        record(entry, "ocr", reason, cached_text.decode("utf-8"), cached=True)
+                        continue
+                    if gemini is None:
+                        # Digital or cached pages need no client, so it is fetched on first need
+                        from .model_registry import get_client
+                        gemini = get_client()
+                        executor = concurrent.futures.ThreadPoolExecutor(max_workers=OCR_WORKERS)
+                    pending.append((entry, reason, (image_bytes, mime_type, page_key)))
+                except Exception:
+                    in_flight.release()
+                    raise
+                if len(pending) >= OCR_BATCH_PAGES:
+                    submit_batch()
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                entry["reason"] = str(e)
+                print(f"Error processing page {page_num + 1}: {str(e)}")
+                report(entry)
+                continue
+
+        if pending:
+            submit_batch()
+
+        # Entries are filled in place, so pages stay in document order
+        while concurrent.futures.wait(futures, timeout=poll_timeout()).not_done:
+            check_deadline()
+        finished = True
+    finally:
+        if executor:
+            # An abandoned request drops the OCR batches that have not started yet
+            # and does not wait for those in flight (they only touch rendered images)
+            executor.shutdown(wait=finished, cancel_futures=not finished)
+        # Always close the document
+        doc.close()
+
+    # Only fully extracted documents are cached, so failed pages get retried next time
+    if EXTRACTION_CACHE_ENABLED and pages and all(page["method"] != "failed" for page in pages):
+        extraction_cache.set_json(doc_key, pages)
+
+    return pages
+
+def extraction_report(pages: list) -> list:
+    """
+    Strips the text out of extract_pages_from_pdf's result, leaving the per-page
+    record of which extraction path was taken.
+    """
+    return [{key: value for key, value in page.items() if key != "text"} for page in pages]
+
+def pages_to_text(pages: list) -> str:
+    """
+    Joins the page texts from extract_pages_from_pdf into one document string.
+    """
+    return "\n".join(page["text"] for page in pages if page["text"]).strip()
 
 # --- Example Usage (for testing this file directly) ---
 # This part will only run when you execute `python pdf_processor.py`
@@ -150,7 +555,7 @@ if __name__ == '__main__':
         # We open the file in binary read mode to get a stream,
         # which is what our function expects.
         with open(test_pdf_path, "rb") as pdf_file_stream:
-            extracted_text = extract_text_from_pdf(pdf_file_stream)
+            extracted_text = pages_to_text(extract_pages_from_pdf(pdf_file_stream))
         
         if extracted_text:
             print("\nExtraction Successful!")
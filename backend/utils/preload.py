@@ -0,0 +1,31 @@
+# backend/utils/preload.py
+
+import gc
+import importlib
+
+# --- Preloading ---
+# A single process starts quickly because the heavy SDKs (Gemini, PyMuPDF,
+# NumPy) are only imported by the first request that needs them. With
+# PRELOAD_APP=true gunicorn instead imports the app (settings, clause rule
+# tables, caches) once in the master process, preload() imports the SDKs there
+# too, and every HTTP and job worker forked from it starts with all of that
+# already in memory, shared copy-on-write. Nothing holding a connection or a
+# thread is created here: the model registry, caches and stores open their own
+# in each forked process.
+
+# Imported only for their side effect of being in sys.modules before the fork
+PRELOAD_MODULES = ("fitz", "numpy")
+
+def preload():
+    """
+    Imports what the first requests of every worker would otherwise import on
+    their own. Call in the master process after the app is loaded, before forking.
+    """
+    from .model_registry import load_sdk
+
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    load_sdk()
+    # Objects that exist now are left out of garbage collection: a collection
+    # in a worker would otherwise write to their pages and un-share them
+    gc.freeze()
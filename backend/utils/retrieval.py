@@ -0,0 +1,113 @@
+# backend/utils/retrieval.py
+
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# Documents shorter than this are always sent whole to /ask
+RETRIEVAL_MIN_CHARS = int(os.getenv("RETRIEVAL_MIN_CHARS", "6000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i if in is it its me my of on or "
+    "so that the their them this to was were what when where which who will with "
+    "can do does how should would shall there any".split()
+)
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 over a document's clause chunks, held as sparse postings: for
+    every term, the chunks it occurs in and its BM25 weight in each.
+
+    The weights are precomputed at build time, so scoring a question only
+    touches the postings of its terms. Memory grows with the number of
+    (term, chunk) pairs rather than chunks x vocabulary.
+    """
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        # NumPy is only loaded by the first /ask that needs retrieval (or preload.preload())
+        import numpy as np
+
+        self.chunks = chunks
+        counts = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        term_rows = {}
+        for row, chunk_counts in enumerate(counts):
+            for term in chunk_counts:
+                term_rows.setdefault(term, []).append(row)
+
+        # All postings in two flat arrays; self.postings maps a term to its (start, stop) slice
+        self.postings = {}
+        rows = []
+        for term, term_row_list in term_rows.items():
+            self.postings[term] = (len(rows), len(rows) + len(term_row_list))
+            rows.extend(term_row_list)
+        self.rows = np.array(rows, dtype=np.int32)
+        tf = np.array([counts[row][term] for term, term_row_list in term_rows.items() for row in term_row_list], dtype=np.float32)
+        doc_freq = np.array([len(term_row_list) for term_row_list in term_rows.values()], dtype=np.float32)
+
+        lengths = np.array([sum(chunk_counts.values()) for chunk_counts in counts], dtype=np.float32)
+        avg_length = lengths.mean() if len(chunks) else 1.0
+        idf = np.log(1 + (len(chunks) - doc_freq + 0.5) / (doc_freq + 0.5))
+        norm = k1 * (1 - b + b * lengths / (avg_length or 1.0))
+        self.weights = (np.repeat(idf, doc_freq.astype(np.int64)) * tf * (k1 + 1) / (tf + norm[self.rows])).astype(np.float32)
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K) -> list:
+        """
+        Returns the top_k best matching chunks, in document order.
+        """
+        import numpy as np
+
+        spans = [self.postings[token] for token in tokenize(query) if token in self.postings]
+        if not spans or not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for start, stop in spans:
+            # A term's postings name each chunk once, so plain fancy-index addition is safe
+            scores[self.rows[start:stop]] += self.weights[start:stop]
+        top_k = min(top_k, len(self.chunks))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = [int(i) for i in best if scores[i] > 0]
+        return [self.chunks[i] for i in sorted(best)]
+
+# Built indexes are kept per worker process; only the document text lives in the document store
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+INDEX_CACHE_SIZE = 32
+
+def get_index(document_id: str, text: str) -> BM25Index:
+    """
+    Returns the BM25 index of a stored document, splitting it into clauses and
+    building the index on first use in this process.
+    """
+    from .clauses import split_clauses
+
+    with _index_cache_lock:
+        index = _index_cache.get(document_id)
+        if index is not None:
+            _index_cache.move_to_end(document_id)
+            return index
+    index = BM25Index(split_clauses(text))
+    with _index_cache_lock:
+        _index_cache[document_id] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+def retrieve_passages(document_id: str, text: str, question: str):
+    """
+    Picks the passages of a stored document that are relevant to a question.
+
+    Returns:
+        A list of passage strings, or None when the whole document should be
+        sent (short documents, or no passage matched the question).
+    """
+    if len(text) <= RETRIEVAL_MIN_CHARS:
+        return None
+    passages = get_index(document_id, text).search(question)
+    if not passages:
+        return None
+    return [passage["text"] for passage in passages]
@@ -0,0 +1,296 @@
+# backend/utils/scheduler.py
+
+import os
+import time
+import random
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from .cache import CACHE_DIR
+from .metrics import inc, observe
+from .deadlines import DeadlineExceeded, check_deadline, remaining_seconds
+
+# --- Scheduler Settings ---
+# Every Gemini call passes through one scheduler whose state lives in a SQLite
+# file, so all gunicorn workers and job processes on the box share it:
+#   - token buckets for requests/min and tokens/min (set them to your quota)
+#   - priority lanes: lower lanes may not use the last part of each bucket,
+#     which stays free for interactive calls such as /ask
+#   - exponential backoff with full jitter on 429/5xx; a 429 also pauses every
+#     process for the backoff so they do not retry in lockstep
+#   - a circuit breaker that fails calls fast after repeated upstream failures
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_DB_PATH = os.path.join(CACHE_DIR, "scheduler.sqlite3")
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "300"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+SCHEDULER_MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "4"))
+SCHEDULER_BACKOFF_BASE_SECONDS = float(os.getenv("SCHEDULER_BACKOFF_BASE_SECONDS", "1"))
+SCHEDULER_BACKOFF_MAX_SECONDS = float(os.getenv("SCHEDULER_BACKOFF_MAX_SECONDS", "30"))
+# A call that cannot get capacity within this long fails with RateLimited
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "60"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+# Share of each bucket a lane must leave untouched for the lanes above it
+LANES = {"interactive": 0.0, "standard": 0.1, "bulk": 0.3}
+DEFAULT_LANE = "standard"
+# Longest single sleep while waiting for capacity, so waiters notice refills promptly
+MAX_POLL_SECONDS = 1.0
+
+# Status codes and exception names (google.api_core) worth retrying
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+THROTTLE_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+# Exception names of calls that timed out (google.api_core, requests)
+TIMEOUT_ERRORS = {"DeadlineExceeded", "GatewayTimeout", "Timeout", "ReadTimeout", "ConnectTimeout"}
+
+class RateLimited(Exception):
+    """Raised when a call could not get rate-limit capacity within SCHEDULER_MAX_WAIT_SECONDS."""
+
+class CircuitOpen(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+_lane = contextvars.ContextVar("scheduler_lane", default=None)
+
+@contextmanager
+def lane(name: str):
+    """
+    Runs a block's model calls in lane `name`, overriding each call's own lane (e.g. "bulk" for background jobs).
+    """
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    # google.api_core errors carry an int code; grpc-style ones a callable
+    if callable(code):
+        code = getattr(code(), "value", (None,))[0]
+    return code if isinstance(code, int) else None
+
+def is_throttle(error) -> bool:
+    return type(error).__name__ in THROTTLE_ERRORS or _status_code(error) == 429
+
+def is_timeout(error) -> bool:
+    return isinstance(error, TimeoutError) or type(error).__name__ in TIMEOUT_ERRORS or _status_code(error) == 504
+
+def is_retryable(error) -> bool:
+    """
+    True for throttling and transient upstream errors; False for bad requests, blocked prompts and the like.
+    """
+    return type(error).__name__ in RETRYABLE_ERRORS or _status_code(error) in RETRYABLE_STATUS
+
+class Scheduler:
+    """
+    Rate limiter, retry policy and circuit breaker for upstream model calls,
+    shared across processes through a SQLite file. Each bucket holds one
+    window_seconds' worth of quota (Gemini quotas are per minute). clock, sleep
+    and rand can be replaced to drive it deterministically.
+    """
+    def __init__(self, path=None, requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=GEMINI_TOKENS_PER_MINUTE, window_seconds=60.0,
+                 clock=time.time, sleep=time.sleep, rand=random.random):
+        self.path = path or SCHEDULER_DB_PATH
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_capacity = requests_per_minute * window_seconds / 60
+        self.token_capacity = tokens_per_minute * window_seconds / 60
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = rand
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS limiter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                requests REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                paused_until REAL NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                open_until REAL NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO limiter (id, requests, tokens, updated) VALUES (1, ?, ?, ?)",
+            (self.request_capacity, self.token_capacity, self.clock()),
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _try_acquire(self, cost_tokens: float, lane_name: str) -> float:
+        """
+        Takes one request and cost_tokens from the buckets if this lane may.
+
+        Returns:
+            0 if acquired, otherwise roughly how long to wait before trying again.
+
+        Raises:
+            CircuitOpen: While the breaker is open.
+        """
+        reserve = LANES.get(lane_name, LANES[DEFAULT_LANE])
+        with self._transaction() as conn:
+            requests, tokens, updated, paused_until, open_until = conn.execute(
+                "SELECT requests, tokens, updated, paused_until, open_until FROM limiter WHERE id = 1"
+            ).fetchone()
+            now = self.clock()
+            if open_until > now:
+                raise CircuitOpen(f"Gemini calls are paused for {open_until - now:.0f}s after repeated failures")
+            if paused_until > now:
+                return paused_until - now
+
+            elapsed = max(0.0, now - updated)
+            requests = min(self.request_capacity, requests + elapsed * self.requests_per_minute / 60)
+            tokens = min(self.token_capacity, tokens + elapsed * self.tokens_per_minute / 60)
+
+            def allowed(available, cost, capacity):
+                # A full bucket always admits, so a call bigger than the reserve can still run
+                return available >= capacity or available - cost >= reserve * capacity
+
+            if allowed(requests, 1, self.request_capacity) and allowed(tokens, cost_tokens, self.token_capacity):
+                # After the open period the next call is a trial (half-open); the rest
+                # fail fast until record_success closes the breaker or a failure reopens it
+                conn.execute(
+                    "UPDATE limiter SET requests = ?, tokens = ?, updated = ?, open_until = ? WHERE id = 1",
+                    (requests - 1, tokens - cost_tokens, now, now + CIRCUIT_OPEN_SECONDS if open_until else 0),
+                )
+                return 0.0
+
+            conn.execute("UPDATE limiter SET requests = ?, tokens = ?, updated = ? WHERE id = 1", (requests, tokens, now))
+            # Time until the bucket holds enough (at most a full bucket, which always admits)
+            request_needed = min(1 + reserve * self.request_capacity, self.request_capacity)
+            token_needed = min(cost_tokens + reserve * self.token_capacity, self.token_capacity)
+            request_wait = (request_needed - requests) * 60 / self.requests_per_minute
+            token_wait = (token_needed - tokens) * 60 / self.tokens_per_minute
+            return max(request_wait, token_wait, 0.01)
+
+    def acquire(self, cost_tokens: float = 0, lane_name: str = DEFAULT_LANE):
+        """
+        Blocks until the call may go out.
+
+        Raises:
+            CircuitOpen: If the breaker is open.
+            RateLimited: If no capacity freed up within SCHEDULER_MAX_WAIT_SECONDS
+                         or before the request's deadline.
+        """
+        started = self.clock()
+        while True:
+            wait = self._try_acquire(cost_tokens, lane_name)
+            waited = self.clock() - started
+            if not wait:
+                observe("saralkanoon_stage_seconds", waited, stage=f"scheduler_wait_{lane_name}")
+                return
+            remaining = remaining_seconds()
+            if waited + wait > SCHEDULER_MAX_WAIT_SECONDS or (remaining is not None and wait > remaining):
+                inc("saralkanoon_rate_limited_total", lane=lane_name)
+                raise RateLimited(f"No Gemini capacity within {SCHEDULER_MAX_WAIT_SECONDS:.0f}s or before the request deadline")
+            self.sleep(min(wait, MAX_POLL_SECONDS))
+
+    def settle(self, token_delta: float):
+        """
+        Corrects the token bucket once a call's real usage is known (actual minus estimated tokens).
+        """
+        if token_delta:
+            with self._transaction() as conn:
+                conn.execute("UPDATE limiter SET tokens = tokens - ? WHERE id = 1", (token_delta,))
+
+    def record_success(self):
+        conn = self._connect()
+        conn.execute("UPDATE limiter SET failures = 0, open_until = 0 WHERE id = 1 AND (failures > 0 OR open_until > 0)")
+
+    def record_failure(self, throttled: bool, backoff: float):
+        """
+        Counts an upstream failure towards the breaker; a throttle also pauses all callers for backoff seconds.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            failures, open_until = conn.execute("SELECT failures, open_until FROM limiter WHERE id = 1").fetchone()
+            failures += 1
+            if failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if not open_until:
+                    print(f"Circuit breaker open for {CIRCUIT_OPEN_SECONDS:.0f}s after {failures} failures")
+                    inc("saralkanoon_circuit_opened_total")
+                open_until = now + CIRCUIT_OPEN_SECONDS
+            conn.execute(
+                "UPDATE limiter SET failures = ?, open_until = ?, paused_until = MAX(paused_until, ?) WHERE id = 1",
+                (failures, open_until, now + backoff if throttled else 0),
+            )
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full-jitter exponential backoff: uniform between 0 and base * 2^attempt, capped.
+        """
+        return self.rand() * min(SCHEDULER_BACKOFF_MAX_SECONDS, SCHEDULER_BACKOFF_BASE_SECONDS * 2 ** attempt)
+
+    def call(self, fn, lane_name: str = DEFAULT_LANE, estimated_tokens: float = 0, stage_name: str = ""):
+        """
+        Runs fn() once capacity is available, retrying throttled and transient failures with backoff.
+
+        Args:
+            fn: The upstream call, taking no arguments.
+            lane_name: One of LANES; a surrounding lane() block takes precedence.
+            estimated_tokens: Tokens the call is expected to use (prompt + response).
+            stage_name: Label for the retry metrics.
+
+        Raises:
+            CircuitOpen, RateLimited, DeadlineExceeded, or fn's own exception once
+            retries are exhausted or the request deadline leaves no time for another.
+        """
+        check_deadline()
+        if not SCHEDULER_ENABLED:
+            return fn()
+        lane_name = _lane.get() or lane_name
+        for attempt in range(SCHEDULER_MAX_RETRIES + 1):
+            check_deadline()
+            self.acquire(estimated_tokens, lane_name)
+            try:
+                result = fn()
+            except Exception as e:
+                if isinstance(e, DeadlineExceeded):
+                    raise
+                if is_timeout(e) and remaining_seconds() == 0:
+                    # Cut off by this request's own deadline (the call's network timeout),
+                    # which says nothing about upstream, so it is not counted as a failure
+                    raise DeadlineExceeded(f"{stage_name or 'Model call'} ran out of time: {e}") from e
+                if not is_retryable(e):
+                    raise
+                delay = self.backoff(attempt)
+                self.record_failure(is_throttle(e), delay)
+                remaining = remaining_seconds()
+                if attempt == SCHEDULER_MAX_RETRIES or (remaining is not None and delay >= remaining):
+                    raise
+                inc("saralkanoon_retries_total", stage=stage_name or "model_call")
+                print(f"Retrying {stage_name or 'model call'} in {delay:.1f}s after: {e}")
+                self.sleep(delay)
+                continue
+            self.record_success()
+            return result
+
+scheduler = Scheduler()
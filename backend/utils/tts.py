@@ -0,0 +1,92 @@
+# backend/utils/tts.py
+
+import os
+import re
+import concurrent.futures
+from io import BytesIO
+from .cache import DiskCache, sha256_hex
+from .metrics import stage, traced
+
+# Text is synthesized sentence by sentence, TTS_PARALLELISM at a time, and
+# every sentence's MP3 is cached on disk by (sentence hash, language).
+TTS_PARALLELISM = int(os.getenv("TTS_PARALLELISM", "4"))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "300"))
+audio_cache = DiskCache("audio", int(os.getenv("TTS_CACHE_MAX_MB", "128")) * 1024 * 1024)
+
+# Sentence ends, including the Devanagari danda used in Hindi text
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+def gtts_synthesize(text: str, lang: str) -> bytes:
+    """
+    Default backend: MP3 bytes from Google Text-to-Speech.
+    """
+    from gtts import gTTS
+
+    audio_fp = BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(audio_fp)
+    return audio_fp.getvalue()
+
+_backend = {"synthesize": gtts_synthesize}
+
+def set_tts_backend(synthesize):
+    """
+    Swaps the synthesizer, a callable (text, lang) -> MP3 bytes, e.g. for a local stand-in in tests.
+    """
+    _backend["synthesize"] = synthesize
+
+def split_sentences(text: str, max_chars: int = TTS_CHUNK_CHARS) -> list:
+    """
+    Splits text into sentence-aligned chunks of roughly max_chars.
+    Short sentences are grouped so that each chunk is one reasonably sized synthesis call.
+    """
+    chunks = []
+    current = ""
+    for sentence in SENTENCE_END.split(" ".join(text.split())):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def synthesize_chunk(text: str, lang: str) -> bytes:
+    """
+    MP3 bytes for one chunk, from the audio cache when possible.
+    """
+    with stage("tts_chunk", lang=lang, chars_in=len(text)) as span:
+        key = f"{lang}:{sha256_hex(text)}"
+        audio = audio_cache.get(key)
+        span["cached"] = audio is not None
+        if audio is None:
+            audio = _backend["synthesize"](text, lang)
+            if audio:
+                audio_cache.set(key, audio)
+        span["bytes"] = len(audio or b"")
+        return audio
+
+def synthesize_stream(text: str, lang: str):
+    """
+    Yields MP3 data chunk by chunk, in order, while later chunks are still being synthesized.
+    MP3 frames can simply be concatenated, so the pieces play back as one file.
+
+    Raises:
+        Exception: If the first chunk fails; later failures skip that chunk.
+    """
+    chunks = split_sentences(text)
+    if not chunks:
+        return
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=TTS_PARALLELISM)
+    try:
+        futures = [executor.submit(traced(synthesize_chunk), chunk, lang) for chunk in chunks]
+        for index, future in enumerate(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                if index == 0:
+                    raise
+                print(f"TTS error on chunk {index + 1} of {len(chunks)}: {e}")
+    finally:
+        # Stop pending synthesis if the client went away mid-stream
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -3,7 +3,7 @@ import { Flag, FileText, AlertTriangle, CheckCircle, Shield, Eye, TrendingUp, Pl
 import type { AnalysisResult } from '../../types';
 import { cn } from '../../lib/utils';
 import { useState, useRef, useEffect } from 'react';
-import { translateSection, getAudio } from '../../lib/api';
+import { translateBatch, getAudio } from '../../lib/api';
 
 interface AnalysisDisplayProps {
   analysisResult: AnalysisResult;
@@ -25,6 +25,8 @@ export const AnalysisDisplay = ({ analysisResult }: AnalysisDisplayProps) => {
   const [translatedFlags, setTranslatedFlags] = useState<(string | null)[]>(redFlags.map(() => null));
   const [flagsLangs, setFlagsLangs] = useState<string[]>(redFlags.map(() => 'en'));
   const [translatingKey, setTranslatingKey] = useState<string | null>(null); // NEW: State for translation loading
+  // Hindi text of every item by key, fetched with one /translate/batch request the first time any item is translated
+  const hindiRef = useRef<Promise<Record<string, string>> | null>(null);
 
   // --- Proactive Audio Fetching ---
   useEffect(() => {
@@ -84,6 +86,21 @@ export const AnalysisDisplay = ({ analysisResult }: AnalysisDisplayProps) => {
     audio.onended = () => setPlayingKey(null);
   };
 
+  const loadHindi = () => {
+    if (!hindiRef.current) {
+      const items = [
+        { key: 'summary', text: summary },
+        ...keyClauses.map((c, i) => ({ key: `clause-${i}`, text: `${c.title}. ${c.detail}` })),
+        ...redFlags.map((f, i) => ({ key: `flag-${i}`, text: `${f.title}. ${f.detail}` })),
+      ];
+      hindiRef.current = translateBatch(items.map(item => item.text), ['hi'])
+        .then(translations => Object.fromEntries(items.map((item, i) => [item.key, translations.hi[i]])));
+      // A failed request is tried again on the next click
+      hindiRef.current.catch(() => { hindiRef.current = null; });
+    }
+    return hindiRef.current;
+  };
+
   const handleTranslate = async (
     type: 'summary' | 'clause' | 'flag',
     index: number = 0
@@ -111,7 +128,8 @@ export const AnalysisDisplay = ({ analysisResult }: AnalysisDisplayProps) => {
     setTranslatingKey(key); // Set loading state
 
     try {
-      const translatedText = await translateSection('section', textToTranslate, targetLang);
+      // Back to English is the original text
+      const translatedText = targetLang === 'hi' ? (await loadHindi())[key] : textToTranslate;
       const audioBlob = await getAudio(translatedText, targetLang);
       const audioUrl = URL.createObjectURL(audioBlob);
 
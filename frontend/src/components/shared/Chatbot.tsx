@@ -8,9 +8,10 @@ import { cn } from '../../lib/utils';
 
 interface ChatbotProps {
   className?: string;
+  documentId?: string;
 }
 
-export const Chatbot = ({ className }: ChatbotProps) => {
+export const Chatbot = ({ className, documentId }: ChatbotProps) => {
   const [open, setOpen] = useState(false);
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [inputValue, setInputValue] = useState('');
@@ -36,7 +37,7 @@ export const Chatbot = ({ className }: ChatbotProps) => {
     if (inputValue) setInputValue('');
 
     try {
-      const aiResponse = await askQuestion(userMessage);
+      const aiResponse = await askQuestion(userMessage, documentId);
       setMessages((prev) => {
         const updated = [...prev];
         const lastMessage = updated[updated.length - 1];
@@ -43,19 +43,21 @@ export const analyzeDocument = async (file: File): Promise<AnalysisResult> => {
   return response.data as AnalysisResult;
 };
 
-export const askQuestion = async (question: string): Promise<{ answer: string }> => {
-  const response = await apiClient.post<{ answer: string }>('/ask', { question });
+export const askQuestion = async (question: string, documentId?: string): Promise<{ answer: string }> => {
+  const response = await apiClient.post<{ answer: string }>('/ask', { question, document_id: documentId });
   return response.data;
 };
 
-// Translate a section of the document
-export const translateSection = async (section: string, text: string, targetLang: string): Promise<string> => {
-  const response = await apiClient.post<{ translated: string }>('/translate', {
-    section,
-    text,
-    target_lang: targetLang,
+// Translate many segments into one or more languages in a single request
+export const translateBatch = async (
+  segments: string[],
+  targetLangs: string[]
+): Promise<Record<string, string[]>> => {
+  const response = await apiClient.post<{ translations: Record<string, string[]> }>('/translate/batch', {
+    segments,
+    target_langs: targetLangs,
   });
-  return response.data.translated;
+  return response.data.translations;
 };
 
 // Get audio for a section of text
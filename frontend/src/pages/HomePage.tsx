@@ -137,7 +137,7 @@ export const HomePage = () => {
               <AnalysisDisplay analysisResult={analysisResult} />
               
               <div className="max-w-5xl mx-auto">
-                <Chatbot />
+                <Chatbot documentId={analysisResult.documentId} />
               </div>
             </div>
           </div>
@@ -4,10 +4,21 @@ export interface Clause {
   detail: string;
 }
 
+// How one page of the uploaded PDF was read
+export interface PageExtraction {
+  page: number;
+  method: 'text-layer' | 'ocr' | 'failed';
+  reason: string;
+  chars: number;
+  cached: boolean;
+}
+
 export interface AnalysisResult {
   summary: string;
   keyClauses: Clause[];
   redFlags: Clause[];
+  documentId?: string;
+  extraction?: PageExtraction[];
 }
 
 export interface ApiError {